@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+
+class Cgroups:
+
+    '''
+    cgroup v2 subtree for the runs of limited jobs. The cgroup of the server
+    must be delegated (writable) and offer the memory and cpu controllers.
+    Since a cgroup with enabled controllers can't hold processes itself, the
+    server moves into the leaf snowflake-server and every limited job gets
+    a cgroup below snowflake-jobs:
+
+        <cgroup of the server>/
+            snowflake-server/   the server process
+            snowflake-jobs/
+                <job id>/       memory.max, memory.swap.max, cpu.max
+
+    The subtree is set up with the first job which needs it (see setup),
+    until then available is None. If cgroup v2 is not usable, available
+    is False and the jobs fall back to rlimits (see ResourceLimits).
+    '''
+
+    controllers = ('memory', 'cpu')
+    period = 100000
+
+    def __init__ (self, root='/sys/fs/cgroup'):
+
+        self.root = root
+        # directory of the job cgroups
+        self.jobs = None
+        # job id -> oom kill count of its cgroup at the start of the run
+        self.oom_kills = {}
+        self.available = None
+        self.lock = threading.Lock()
+
+    def oomKilled (self, id):
+
+        '''
+        Returns True if the memory limit killed a process of
+        the current run of the job.
+        '''
+
+        return self.oomKills(id) > self.oom_kills.get(id, 0)
+
+    def oomKills (self, id):
+
+        '''
+        Returns the oom kill count of the cgroup of the job.
+        '''
+
+        try:
+            with open(f'{self.jobs}/{id}/memory.events') as f:
+                for line in f:
+                    key, value = line.split()
+                    if key == 'oom_kill':
+                        return int(value)
+        except (OSError, ValueError):
+            pass
+        return 0
+
+    def prepare (self, id, limits):
+
+        '''
+        Creates (or updates) the cgroup of the job for a new run and returns
+        the path of its cgroup.procs file, or None if the limits don't need
+        a cgroup or cgroups are not available.
+        '''
+
+        if not self.available or not (limits.max_memory or limits.cpu_quota):
+            return None
+        path = f'{self.jobs}/{id}'
+        os.makedirs(path, exist_ok=True)
+        self._write(f'{path}/memory.max', limits.max_memory or 'max')
+        # a job at its limit is killed instead of pushing the host into
+        # swap, together with the rest of its process tree
+        self._write(f'{path}/memory.swap.max', 0 if limits.max_memory else 'max')
+        try:
+            self._write(f'{path}/memory.oom.group', 1)
+        except OSError:
+            # kernels before 4.19 only kill the offending process
+            pass
+        quota = int(limits.cpu_quota * self.period) if limits.cpu_quota else 'max'
+        self._write(f'{path}/cpu.max', f'{quota} {self.period}')
+        self.oom_kills[id] = self.oomKills(id)
+        return f'{path}/cgroup.procs'
+
+    def setup (self):
+
+        '''
+        Sets up the subtree once and returns True if it is available.
+        A failed setup leaves the cgroups as they were.
+        '''
+
+        with self.lock:
+            if self.available is None:
+                self.available = self._setup()
+        return self.available
+
+    def remove (self, id):
+
+        '''
+        Removes the cgroup of a job, a cgroup which still holds
+        processes is kept.
+        '''
+
+        self.oom_kills.pop(id, None)
+        if self.available:
+            try:
+                os.rmdir(f'{self.jobs}/{id}')
+            except OSError:
+                pass
+
+    # - private methods
+    def _descendants (self, pid):
+
+        '''
+        Returns the pid and the pids of all its descendants.
+        '''
+
+        children = {}
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    # the command name in parentheses may contain spaces
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+        pids, stack = set(), [pid]
+        while stack:
+            pid = stack.pop()
+            pids.add(pid)
+            stack.extend(children.get(pid, ()))
+        return pids
+
+    def _move (self, pids, path):
+
+        '''
+        Moves the processes into the cgroup, exited ones are skipped.
+        '''
+
+        for pid in pids:
+            try:
+                self._write(f'{path}/cgroup.procs', pid)
+            except ProcessLookupError:
+                pass
+
+    def _read (self, path):
+
+        with open(path) as f:
+            return f.read().split()
+
+    def _setup (self):
+
+        '''
+        Finds the cgroup of the server, moves the server (with its children)
+        into its leaf and enables the controllers for the job cgroups.
+        Returns False if cgroup v2 is not mounted or not delegated, or if
+        other processes share the cgroup of the server, which rules out
+        enabling the controllers. A failure on the way is rolled back.
+        '''
+
+        try:
+            if not os.path.exists(f'{self.root}/cgroup.controllers'):
+                return False
+            with open('/proc/self/cgroup') as f:
+                path = next((line[3:].strip() for line in f if line.startswith('0::')), None)
+            if path is None:
+                return False
+            base = self.root + path.rstrip('/')
+            # a restarted server may still sit in the leaf of its predecessor
+            if base.endswith('/snowflake-server'):
+                base = os.path.dirname(base)
+            if not set(self.controllers) <= set(self._read(f'{base}/cgroup.controllers')):
+                return False
+            missing = set(self.controllers) - set(self._read(f'{base}/cgroup.subtree_control'))
+            procs = {int(pid) for pid in self._read(f'{base}/cgroup.procs')}
+            # a cgroup with processes can't enable controllers (except the
+            # root), only the server and its children may leave it
+            movable = procs & self._descendants(os.getpid()) if base != self.root else set()
+            if missing and procs - movable and base != self.root:
+                return False
+            if not all(os.access(f'{base}/{f}', os.W_OK) for f in ('cgroup.procs', 'cgroup.subtree_control')):
+                return False
+        except OSError:
+            return False
+
+        created, enabled, moved = [], [], set()
+        try:
+            if movable:
+                os.makedirs(f'{base}/snowflake-server', exist_ok=True)
+                created.append(f'{base}/snowflake-server')
+                self._move(movable, f'{base}/snowflake-server')
+                moved = movable
+            if missing:
+                self._write(f'{base}/cgroup.subtree_control', ' '.join(f'+{c}' for c in missing))
+                enabled = missing
+            if not os.path.isdir(f'{base}/snowflake-jobs'):
+                os.mkdir(f'{base}/snowflake-jobs')
+                created.append(f'{base}/snowflake-jobs')
+            self._write(f'{base}/snowflake-jobs/cgroup.subtree_control', ' '.join(f'+{c}' for c in self.controllers))
+        except OSError:
+            # leave the cgroups as they were
+            try:
+                if enabled:
+                    self._write(f'{base}/cgroup.subtree_control', ' '.join(f'-{c}' for c in enabled))
+                self._move(moved, base)
+            except OSError:
+                pass
+            for directory in reversed(created):
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    pass
+            return False
+        self.jobs = f'{base}/snowflake-jobs'
+        return True
+
+    def _write (self, path, value):
+
+        with open(path, 'w') as f:
+            f.write(str(value))
@@ -3,12 +3,32 @@
 
 from backend.pipe import pipe
 from backend.job import Job
+from backend.record import JobRecord, JobSnapshot, JobTable
+from backend.store import Store
+from backend.scheduler import Scheduler
+from backend.supervisor import Supervisor
+from backend.runqueue import RunQueue
+from backend.pressure import PressureGate
+from backend.zygote import Zygote
+from backend.output import OutputCapture
+from backend.sampler import Sampler
+from backend.cgroups import Cgroups
+from backend.loader import CustomJobLoader
+from backend.logs import RunLog, listRuns, pruneRuns, tailLines
+from backend.cron import CronSchedule
+from backend.window import OperatingWindow
 import pathlib
-from os import listdir
+from os import makedirs, urandom
+from time import time, monotonic, sleep
 from datetime import datetime
-from numpy.random import randint
 from traceback import format_exc
-import importlib.util
+import heapq
+from collections import deque
+from bisect import bisect_left, bisect_right, insort
+import threading
+from fnmatch import fnmatchcase
+import json
+import signal
 
 class Core:
 
@@ -34,28 +54,154 @@ class Core:
         # show banner
         self.log(self.banner, 'blue', indent=1)
 
-        # process data
-        self.jobs = {}
+        # server configuration
+        self.rootDirectory = str(pathlib.Path(__file__).parent.parent.resolve())
+        self.config = self._loadConfig()
+
+        # process data. All changes of jobs are serialized by the lock
+        # (manager rounds, deploys, configuration, enable/disable, reloads).
+        self.jobs = JobTable()
+        self.lock = threading.RLock()
+
+        # serialized job table for listings: the revision grows with every
+        # actual change of a job, each job keeps the revision of its last
+        # change and its json, removed jobs leave a bounded tombstone.
+        # Writers change these under the lock and publish an immutable
+        # snapshot at most every publish_interval seconds, readers only use
+        # the published snapshot and publish pending changes on demand.
+        self.revision = 0
+        self.listing = {}
+        self.listing_order = []
+        self.removed = {}
+        self.removed_max = 4096
+        self.removed_floor = 0
+        self.listing_dirty = False
+        self.order_dirty = False
+        # pending jobs of the listing
+        self.queue_depth = 0
+        self.published = JobSnapshot()
+        self.published_at = 0
+        self.publish_interval = self.config.get('publish_interval', 0.1)
+
+        # bounded log of job events (deploy, start, stop, finish, enable,
+        # disable, config, reload, remove), followers wait on the condition
+        self.changes = deque(maxlen=self.config.get('change_log_size', 10000))
+        # own lock, readers of the log never wait for the writer lock
+        self.changed = threading.Condition()
+        # revision of the newest event which was dropped from the log
+        self.changes_floor = 0
+
+        # admission control for job starts
+        self.runqueue = RunQueue(self.config.get('max_concurrent'), self.config.get('max_concurrent_per_tag'))
+
+        # holds the starts of low-priority jobs under host pressure, the
+        # manager is woken up under the admission key to retry them
+        self.gate = None
+        admission = dict(self.config.get('admission', {}))
+        if admission.pop('enabled', False):
+            self.gate = PressureGate(**admission)
+        self.admission_key = 'admission'
+
+        # deadline heap which wakes up the manager
+        self.scheduler = Scheduler()
+
+        # stopped runs get SIGTERM and are killed if their process group
+        # outlives the grace period. pid -> (process, pgid) of the runs
+        # which are stopping, their kill deadlines wait in a second
+        # deadline heap, so neither the manager nor a request sleeps.
+        self.stop_grace_period = self.config.get('stop_grace_period', 5)
+        self.halt_deadline = self.config.get('halt_deadline', 10)
+        self.stopping = {}
+        # pid of a stopped run which has not exited yet -> its history
+        # row, which is written with the exit code and time (see _onExit)
+        self.exiting = {}
+        self.reaper = Scheduler()
+        self.escalator = pipe(self._escalate, wait=0)
+        self.escalator.daemon = True
+        self.escalator.start()
+
+        # exit notifications of job subprocesses
+        self.supervisor = Supervisor(self._onExit)
+        self.supervisor.start()
+
+        # drains the output pipes of all jobs into bounded buffers
+        self.output_buffer_size = self.config.get('output_buffer_size', 65536)
+        self.capture = OutputCapture()
+        self.capture.start()
+
+        # cpu, memory and i/o usage of the job process trees
+        self.sampler = Sampler(self.config.get('sample_interval', 5), self.config.get('sample_size', 120))
+        if self.sampler.interval:
+            self.sampler.start()
+
+        # cgroup v2 subtree for resource limits, set up with the first
+        # limited job. Without it the limits fall back to rlimits in the
+        # job process.
+        self.cgroups = Cgroups() if self.config.get('cgroups', True) else None
+
+        # persistent per-run log files
+        self.logDirectory = self.config.get('log_directory', self.rootDirectory + '/logs')
+        self.log_max_bytes = self.config.get('log_max_bytes', 10485760)
+        self.log_backup_count = self.config.get('log_backup_count', 3)
+        self.log_max_runs = self.config.get('log_max_runs', 10)
+
+        # warm fork server for python jobs (optional)
+        self.zygote = None
+        zygote_config = self.config.get('zygote', {})
+        if zygote_config.get('enabled'):
+            self.zygote = Zygote(zygote_config.get('preload', []))
+            self.zygote.start()
+            self.log(f"Started zygote with preloaded modules {zygote_config.get('preload', [])}.")
+
+        # interval (seconds) in which running custom jobs are checked
+        # for exit, these are not subprocesses and can't be supervised.
+        self.poll_interval = 1
 
         # API and request parameters
         self.mandatory_parameters = ['name', 'target_path', 'command']
+        # deploy parameters which are persisted to restore a job
+        self.definition_parameters = ['name', 'target_path', 'command', 'arguments', 'execution', 'active', 'disable',
+                                      'operating_time_window', 'operating_week_days', 'repeat', 'repeat_sleep',
+                                      'schedule', 'priority', 'tags', 'timeout', 'max_memory', 'cpu_quota', 'nice',
+                                      'cpu_affinity', 'time_created']
+        # deploy parameters which the config request may change
+        self.configurable_parameters = ['name', 'operating_time_window', 'operating_week_days', 'priority',
+                                        'repeat', 'repeat_sleep', 'schedule', 'tags', 'timeout']
+        # compiled record fields which follow a configured parameter
+        self.derived_fields = {'operating_time_window': ('operating_window',),
+                               'operating_week_days': ('operating_window',),
+                               'schedule': ('cron', 'next_run')}
+
+        # durable job registry
+        self.store = Store(str(pathlib.Path(self.rootDirectory, self.config.get('database', 'snowflake.db'))))
+        self.store.start()
 
         # load all custom job objects
-        self.customDirectory = str(pathlib.Path(__file__).parent.parent.resolve()) + '/jobs/custom'
+        self.customDirectory = self.rootDirectory + '/jobs/custom'
+        self.loader = CustomJobLoader(self.customDirectory,
+                                      self.rootDirectory + '/' + self.config.get('dependency_cache', 'dependency_cache.json'),
+                                      self.config.get('custom_job_timeout', 10),
+                                      self.config.get('dependency_cache_ttl', 86400))
+        # custom job file path -> job id
+        self.customJobs = {}
         self._loadCustomJobs()
 
+        # restore the deployed jobs of the last session
+        self._restoreJobs()
+
+        # reload custom jobs whose files were added, changed or removed
+        self.reload_interval = self.config.get('custom_reload_interval', 2)
+        if self.reload_interval:
+            self.watcher = pipe(self._reloadCustomJobs, self.reload_interval)
+            self.watcher.daemon = True
+            self.watcher.start()
+
         # ping response
         self.ping_response = 'ping received.'
 
-        # managing daemon
-        # testing = False
-        self.counter=0
-        # if testing:
-        #     while True:
-        #         self._manage()
-        #         sleep(1)
-        # else:
-        self.daemon = pipe(self._manage, wait=1)
+        # managing daemon, blocks in the scheduler
+        # until a job is due, hence no extra wait
+        self.daemon = pipe(self._manage, wait=0)
         self.daemon.start()
         self.log('Started job management.')
     
@@ -93,13 +239,92 @@ class Core:
         
         print(f'{stamp}{indent}{color}{stdout}\033[0m', end=end)
     
-    def deploy (self, requestObject):
+    def changesSince (self, revision, limit=1000):
+
+        '''
+        Returns the job events after the revision (oldest first). 'complete'
+        is False if older events were dropped from the bounded log already,
+        a client should then re-list the jobs.
+
+        RETURN
+        {'revision', 'changes', 'complete'} dictionary, the revision is the
+        one to continue from.
+        '''
+
+        with self.changed:
+            changes = []
+            for change in reversed(self.changes):
+                if change['revision'] <= revision:
+                    break
+                changes.append(change)
+            changes.reverse()
+            complete = revision >= self.changes_floor
+            changes = changes[:limit]
+            latest = changes[-1]['revision'] if changes else revision
+            return {'revision': latest, 'changes': changes, 'complete': complete}
+
+    def configure (self, id, argument, value):
+
+        '''
+        Changes a deploy parameter of the job with the id (see
+        configurable_parameters) and lets the manager re-evaluate the job.
+        The value is validated like on deploy, a new schedule or operating
+        window is compiled again. Renames keep the name index in sync.
+
+        RETURN
+        (bool, string)-tuple like deploy.
+        '''
+
+        if argument not in self.configurable_parameters:
+            return False, f"Unknown argument '{argument}', configurable are {self.configurable_parameters}."
+        with self.lock:
+            job = self.jobs.get(id)
+            if not job:
+                return False, f"Identifier '{id}' not found."
+            if argument == 'name':
+                try:
+                    self.jobs.rename(id, value)
+                except ValueError as e:
+                    return False, str(e)
+            else:
+                # custom jobs have no definition, their window is
+                # taken from the record
+                definition = job.definition or {'operating_time_window': job.operating_time_window,
+                                                 'operating_week_days': job.operating_week_days}
+                success, options = self._parseOptions(dict(definition, **{argument: value}))
+                if not success:
+                    return False, options
+                job[argument] = options[argument]
+                for field in self.derived_fields.get(argument, ()):
+                    job[field] = options[field]
+            # restored jobs keep the new value
+            if job.definition:
+                job.definition[argument] = value
+            self._recordChange(id, 'config', {argument: value})
+            self._persist(id)
+            self._publish(lazy=True)
+        self.scheduler.notify(id)
+        return True, ''
+
+    def deploy (self, requestObject, job_id=None):
 
         '''
         Creates a new entry in jobs object and adds a new job by provided variables.
 
         FORMAT
         operating_week_days: ['mon', 'tue', 'wed', 'thu', 'sat', 'sun']
+        schedule: '*/5 * * * *' (5-field cron expression, the job is started
+                  at every fire time which lies in the operating window)
+        execution: 'zygote' (default) forks python jobs from the warm zygote
+                   if it is enabled in config.json, 'popen' always starts a
+                   fresh interpreter.
+        timeout: 300 (maximum runtime of a run in seconds, a run which
+                 exceeds it is stopped and recorded as 'timed_out')
+        max_memory, cpu_quota, nice, cpu_affinity: resource limits, see
+                 ResourceLimits. A run which is killed (or fails) because
+                 of its memory limit is recorded as 'memory_exceeded'.
+
+        A job_id is only provided when a stored job is restored.
 
         RETURN
         (bool, string)-tuple
@@ -107,96 +332,50 @@ class Core:
         and the string will serve as info message.
         '''
 
-        stdout = ''
-
-
-        ''' Request Policy Check '''
-        # -- mandatory parameters --
-        for p in self.mandatory_parameters:
-            if p not in requestObject:
-                stdout = f'Key "{p}" not specified, the mandatory request parameters are {self.mandatory_parameters}'
-                return False, stdout
-
-        # -- optional parameters --
-        if "active" in requestObject:
-            active = requestObject["active"]
-            if type(active) is not bool:
-                stdout = f"active must be boolean!"
-        else:
-            active = False
-        if "disable" in requestObject:
-            disable = requestObject["disable"]
-            if type(disable) is not bool:
-                stdout = f"disable must be boolean!"
-        else:
-            disable = False
-        if "operating_time_window" in requestObject:
-            operating_time_window = requestObject["operating_time_window"]
-            if len(operating_time_window) != 2 or ':' not in operating_time_window[0] or ':' not in operating_time_window[1]:
-                stdout = f"'operating_time_window' wrongly specified! Need a valid time window e.g. '[12:00, 14:30]'"
-        else:
-            operating_time_window = None
-        if "operating_week_days" in requestObject:
-            if type(operating_week_days) is not list:
-                stdout = f"'operating_week_days' must be a list of strings ['mon', 'tue',..]!"
-            operating_week_days = [d.lower()[:3] for d in requestObject["operating_week_days"]]
-        else:
-            operating_week_days = 'all'
-        if "repeat" in requestObject:
-            repeat = requestObject["repeat"]
-            if type(repeat) is not bool:
-                stdout = f"repeat must be boolean!"
-        else:
-            repeat = False
-        if "repeat_sleep" in requestObject:
-            repeat_sleep = requestObject["repeat"]
-            if type(repeat) is not int or repeat < 0:
-                stdout = f"repeat_sleep must be a positive integer!"
-        else:
-            repeat_sleep = 0
-        if stdout != '':
-            return False, stdout
+        success, result = self._prepareJob(requestObject, job_id)
+        if not success:
+            return False, result
+        with self.lock:
+            self._addJob(result)
+            self._publish(lazy=True)
+        # let the manager pick up the new job
+        self.scheduler.notify(result.id)
 
-        # -- certain parameters --
-        # override name if it exists
-        if 'name' in requestObject:
-            name = self._suggestAllowedName(requestObject['name'])
-        else:
-            name = self._suggestAllowedName('Job')
+        return True, ''
 
+    def deployBatch (self, requestObjects, atomic=False):
 
-        # create a dedicated job id
-        job_id = self._generateJobId()
-        # pass the id to the request object
-        # so that the Job object can use it
-        # via the request object.
-        requestObject['id'] = job_id
-        # denote creation time
-        time_created = self._generateUTCTimestamp()
-        # create a process object (will run internal type tests)
-        job_object = Job(requestObject)
-        
+        '''
+        Deploys several jobs at once. All requests are validated before any
+        job is added, then the jobs are added under a single lock acquisition
+        and the manager is woken up once. With atomic, no job is deployed
+        if any request is invalid.
 
-        # append new job to jobs object
-        self.jobs[job_id] = {
-            "active": active,
-            "disabled": disable,
-            "finished": False,
-            "id": job_id,
-            "job": job_object,
-            "name": name,
-            "operating_time_window": operating_time_window,                 
-            "operating_week_days": operating_week_days,
-            "repeat": repeat,
-            "repeat_sleep": 0,
-            "target_path": requestObject['target_path'],
-            "time_created": time_created,
-            "time_duration": 0,
-            "time_started": None,
-            "time_stopped": None
-        }
+        RETURN
+        list of {'index', 'success', 'id', 'name', 'info'} dictionaries,
+        one per request.
+        '''
 
-        return True, stdout
+        prepared = [self._prepareJob(requestObject) for requestObject in requestObjects]
+        results = [{'index': i, 'success': success, 'id': None, 'name': None, 'info': '' if success else result}
+                   for i, (success, result) in enumerate(prepared)]
+        if atomic and not all(success for success, _ in prepared):
+            for result in results:
+                if result['success']:
+                    result['success'] = False
+                    result['info'] = 'Not deployed, the batch contains invalid requests.'
+            return results
+        ids = []
+        with self.lock:
+            for result, (success, record) in zip(results, prepared):
+                if success:
+                    self._addJob(record)
+                    result['id'], result['name'] = record.id, record.name
+                    ids.append(record.id)
+            self._publish(lazy=True)
+        self.scheduler.notifyMany(ids)
+        self.log(f'Deployed {len(ids)} of {len(results)} jobs.', 'blue')
+        return results
 
     def disable (self, identifier):
 
@@ -216,36 +395,392 @@ class Core:
 
         self._enableJob(identifier, True)
 
+    def disableBatch (self, identifiers=None, pattern=None, tag=None, atomic=False):
+
+        '''
+        Disables several jobs at once, see _enableBatch.
+        '''
+
+        return self._enableBatch(False, identifiers, pattern, tag, atomic)
+
+    def enableBatch (self, identifiers=None, pattern=None, tag=None, atomic=False):
+
+        '''
+        Enables several jobs at once, see _enableBatch.
+        '''
+
+        return self._enableBatch(True, identifiers, pattern, tag, atomic)
+
+    def halt (self, deadline=None):
+
+        '''
+        Disables all jobs and stops their runs in parallel: all process
+        groups receive SIGTERM at once, the groups which are still alive
+        after the deadline (seconds, halt_deadline by default) are killed.
+
+        RETURN
+        {'disabled', 'stopped', 'killed', 'seconds'} dictionary.
+        '''
+
+        deadline = self.halt_deadline if deadline is None else deadline
+        start = monotonic()
+        with self.lock:
+            disabled = 0
+            for id, job in self.jobs.items():
+                if not job.disabled:
+                    job.disabled = True
+                    disabled += 1
+                    self._recordChange(id, 'disable')
+                self.scheduler.cancel(id)
+                # the halt kills at the deadline itself,
+                # the escalation is only the fallback
+                self._deactivateIfActive(id, deadline + 1)
+                self._persist(id)
+            self._publish(lazy=True)
+            runs = list(self.stopping.values())
+        stopped = len(runs)
+        while runs and monotonic() - start < deadline:
+            sleep(min(.05, max(0, deadline - monotonic() + start)))
+            runs = [run for run in runs if Job.groupIsAlive(*run)]
+        # kill the rest right away instead of waiting for the escalation
+        runs = [run for run in runs if Job.groupIsAlive(*run)]
+        for run in runs:
+            Job.signalGroup(*run, signal.SIGKILL)
+        self.log(f'Halted: disabled {disabled} jobs, stopped {stopped} runs, killed {len(runs)}.', 'blue')
+        return {'disabled': disabled, 'stopped': stopped, 'killed': len(runs), 'seconds': monotonic() - start}
+
+    def history (self, identifier=None, since=None, until=None, status=None, cursor=None, limit=100):
+
+        '''
+        Queries the run history, optionally of the job corresponding to the
+        identifier, filtered by start time range (epoch seconds) and status
+        ('success', 'failed', 'stopped', 'timed_out', 'memory_exceeded'), see Store.history.
+
+        RETURN
+        history dictionary or None if no job corresponds to the identifier.
+        '''
+
+        job_id = None
+        if identifier:
+            job = self._findJob(identifier)
+            if not job:
+                return None
+            job_id = job.id
+        return self.store.history(job_id, since, until, status, cursor, limit)
+
+    def listJobs (self, fields=None, active=None, disabled=None, name_prefix=None, tag=None,
+                  cursor=None, limit=None, since_revision=None):
+
+        '''
+        Lists the jobs ordered by id, filtered by the active and disabled
+        flags, a name prefix and a tag, projected to the provided fields.
+        The field 'stats' adds the resource summary of each job (see stats),
+        it is sampled continuously and not part of the revision. Pending jobs
+        carry the seconds they have been waiting for a slot as 'wait' (not
+        part of the revision either), queue_depth is the number of pending
+        jobs at the revision.
+        Pagination is cursor based, the returned cursor (an id) is passed
+        to the next call. With since_revision only jobs changed after that
+        revision are listed together with the ids of removed jobs, 'full'
+        is True if the revision is too old for a delta.
+
+        RETURN
+        {'revision', 'jobs', 'cursor', 'removed', 'full', 'queue_depth'} dictionary
+        '''
+
+        snapshot = self._snapshot()
+        now = time()
+        full = since_revision is None or since_revision < snapshot.removed_floor
+        removed = [] if full else [id for id, rev in snapshot.removed.items() if rev > since_revision]
+        start = bisect_right(snapshot.order, cursor) if cursor else 0
+        jobs = []
+        for id in snapshot.order[start:]:
+            revision, job, _ = snapshot.entries[id]
+            if not full and revision <= since_revision:
+                continue
+            if active is not None and job['active'] != active:
+                continue
+            if disabled is not None and job['disabled'] != disabled:
+                continue
+            if name_prefix is not None and not job['name'].startswith(name_prefix):
+                continue
+            if tag is not None and tag not in job['tags']:
+                continue
+            if limit is not None and len(jobs) == limit:
+                cursor = jobs[-1]['id']
+                break
+            if job['queued_at'] is not None:
+                job = dict(job, wait=now - job['queued_at'])
+            jobs.append(job)
+        else:
+            cursor = None
+        if fields:
+            views = []
+            for job in jobs:
+                view = {f: job[f] for f in fields if f in job}
+                if 'stats' in fields:
+                    view['stats'] = self.sampler.summary(job['id'])
+                views.append(view)
+            jobs = views
+        return {'revision': snapshot.revision, 'jobs': jobs, 'cursor': cursor, 'removed': removed, 'full': full,
+                'queue_depth': snapshot.queue_depth}
+
+    def listJson (self):
+
+        '''
+        Returns (revision, json string) of the complete job list, the
+        string is only rebuilt after a job changed.
+        '''
+
+        snapshot = self._snapshot()
+        return snapshot.revision, snapshot.toJson()
+
+    def logs (self, identifier, lines=100, run=None):
+
+        '''
+        Returns the last lines of a job's log. By default the latest run
+        is read, older runs can be selected by their run name.
+
+        RETURN
+        {'id', 'name', 'run', 'runs', 'lines'} dictionary or None if no job
+        corresponds to the identifier.
+        '''
+
+        job = self._findJob(identifier)
+        if not job:
+            return None
+        directory = f"{self.logDirectory}/{job.id}"
+        runs = listRuns(directory)
+        if run is None and runs:
+            run = runs[-1]
+        out = {'id': job.id, 'name': job.name, 'run': run, 'runs': runs, 'lines': []}
+        if run in runs:
+            out['lines'] = tailLines(f'{directory}/{run}.log', lines)
+        return out
+
+    def nextRuns (self, count=10, identifier=None):
+
+        '''
+        Lists the upcoming executions of all scheduled jobs (or of the job
+        corresponding to the identifier) in chronological order.
+
+        RETURN
+        list of {'id', 'name', 'time'} dictionaries with at most count entries.
+        '''
+
+        now = datetime.now()
+        runs = []
+        # list() copies the values in one step, the manager may add jobs meanwhile
+        for job in list(self.jobs.values()):
+            if not job.cron or job.disabled:
+                continue
+            if identifier and identifier not in (job.id, job.name):
+                continue
+            runs.append(self._upcomingRuns(job, now, count))
+        out = []
+        for t, id, name in heapq.merge(*runs):
+            if len(out) == count:
+                break
+            out.append({'id': id, 'name': name, 'time': t.strftime(self.timeFormat)})
+        return out
+
+    def remove (self, identifier):
+
+        '''
+        Stops and removes the job which corresponds with the identifier (id
+        or name), it is not restored anymore. Custom jobs are removed
+        with their file instead.
+
+        RETURN
+        (bool, string)-tuple like deploy.
+        '''
+
+        with self.lock:
+            job = self._findJob(identifier)
+            if not job:
+                return False, f"Identifier '{identifier}' not found."
+            if not job.definition:
+                return False, f"'{job.name}' is a custom job, remove its file instead."
+            self._deactivateIfActive(job.id)
+            self._removeJob(job.id)
+            self._publish(lazy=True)
+        return True, f"Removed job '{job.name}' ({job.id})."
+
+    def stats (self, identifier=None):
+
+        '''
+        Resource usage of the job corresponding to the identifier or of all
+        jobs, sampled from /proc every sample_interval seconds: current, peak
+        and average CPU% ('cpu'), RSS in bytes ('rss') and read/write rates
+        in bytes/s ('read', 'write') over the last sample_size samples, and
+        the total read_bytes and write_bytes.
+
+        RETURN
+        {id: summary} dictionary (summary is None without samples)
+        or None if no job corresponds to the identifier.
+        '''
+
+        if identifier is None:
+            return {id: self.sampler.summary(id) for id in list(self.jobs.keys())}
+        job = self._findJob(identifier)
+        if not job:
+            return None
+        return {job.id: self.sampler.summary(job.id)}
+
+    def waitChanges (self, revision, timeout=None):
+
+        '''
+        Blocks until there are events after the revision or the
+        timeout expires, then returns changesSince(revision).
+        '''
+
+        with self.changed:
+            self.changed.wait_for(lambda: self.changes and self.changes[-1]['revision'] > revision, timeout)
+        return self.changesSince(revision)
+
     # - private methods
     def _activateIfDeactivated (self, id):
 
         job = self.jobs[id]
 
-        if not job['active']:
+        if not job.active:
             self.log(f'Starting job {id} ...', 'y', end='\r')
-            job['active'] = True
+            job.active = True
             # every outside/external activation call 
             # will reset the finished argument
-            job['finished'] = False
+            job.finished = False
             # denote the start time
-            job['time_started'] = self._generateUTCTimestamp()
-            # finally start the job workload
-            job['job'].start()
+            job.time_started = self._generateUTCTimestamp()
+            started = (time(), monotonic())
+            # finally start the job workload, the output of a run goes
+            # through named pipes next to its log, which a restarted
+            # server can open again
+            if isinstance(job.job, Job):
+                log = self._openRunLog(id)
+                try:
+                    job.job.start(log.path[:-len('.log')])
+                except:
+                    log.file.close()
+                    raise
+            else:
+                job.job.start()
+            # a run is open only once its process started
+            job.run_started = started
+            self._recordChange(id, 'start')
+            # capture the output and get notified once the subprocess exits
+            if isinstance(job.job, Job):
+                self.capture.watch(job.job.outputs[0], job.job.stdout, log)
+                self.capture.watch(job.job.outputs[1], job.job.stderr, log)
+                self.supervisor.watch(id, job.job.subprocess)
+                self.sampler.watch(id, job.job.pgid)
             
-    def _deactivateIfActive (self, id):
+    def _addJob (self, record):
+
+        '''
+        Adds a prepared job record with a unique name and persists it.
+        The caller holds the lock and notifies the scheduler.
+        '''
+
+        record.name = self._suggestAllowedName(record.name)
+        record.definition['name'] = record.name
+        self.jobs.add(record)
+        self._recordChange(record.id, 'deploy')
+        self._persist(record.id)
+
+    def _admit (self):
+
+        '''
+        Starts all pending jobs for which the run queue has a free slot
+        and the pressure gate lets them pass.
+        '''
+
+        holding = self.gate and self.gate.holding
+        for id in self.runqueue.admit(self.gate):
+            job = self.jobs.get(id)
+            if not job:
+                self.runqueue.release(id)
+                continue
+            job.pending = False
+            try:
+                self._activateIfDeactivated(id)
+            except:
+                self.log(f"Could not start job '{job.name}' ({id})\n{format_exc()}", 'red')
+                job.active = False
+                self.runqueue.release(id)
+                continue
+            if not job.repeat and not job.cron:
+                # set the finished flag to true already
+                # to avoid another trigger in the next round
+                job.finished = True
+            self._scheduleNext(id, datetime.now())
+            self._persist(id)
+        if self.gate:
+            if self.gate.holding and not holding:
+                self.log(f'Holding low-priority job starts, {self.gate.pressure}.', 'y')
+            elif holding and not self.gate.holding:
+                self.log('Pressure dropped, releasing the held job starts.', 'green')
+            # retry the held starts
+            if (self.gate.holding or self.gate.releasing) and self.runqueue.depth():
+                self.scheduler.schedule(self.admission_key, self.gate.wakeup())
+
+    def _deactivateIfActive (self, id, grace=None, status='stopped'):
+
+        '''
+        Stops the job without waiting for its process, the run
+        is killed after the grace period (stop_grace_period
+        by default) if it ignores SIGTERM. The run is recorded
+        with the status.
+        '''
 
         job = self.jobs[id]
 
-        if job['active']:
+        # drop the job from the run queue if it still waits
+        if job.pending:
+            job.pending = False
+            self.runqueue.release(id)
+
+        if job.active:
+            self.runqueue.release(id)
             self.log(f'Terminating job {id} ...', end='\r')
-            job['active'] = False
-            job['job'].stop()
-            
-            job['time_stopped'] = self._generateUTCTimestamp()
-            delta = datetime.strptime(job['time_stopped'], self.timeFormat) - datetime.strptime(job['time_started'], self.timeFormat)
-            # denote the time duration and save in job object
-            job['time_duration'] = delta
+            job.active = False
+            run = job.job.stop()
+            if isinstance(job.job, Job) and run:
+                self._stopRun(run, self.stop_grace_period if grace is None else grace)
+            self._recordChange(id, 'stop', self._recordRun(id, status, run[0] if isinstance(job.job, Job) and run else None))
             
+    def _deployCustomJob (self, path, job):
+
+        '''
+        Deploys a loaded custom job object.
+        '''
+
+        # now an alternative deploy is performed
+        # for this generate an id and name first
+        job_id = self._generateJobId()
+        name = self._suggestAllowedName(job.name)
+        # for custom jobs there is no targetpath needed, since the
+        # workload is triggered directly from the custom job object (method).
+        # The target_path will be overriden with the path of the custom job file.
+        self.jobs.add(JobRecord(job_id, name, job, path, self._generateUTCTimestamp(),
+                                OperatingWindow.shared(), active=job.active, tags=[]))
+        self.customJobs[path] = job_id
+        self._recordChange(job_id, 'deploy')
+        self._updateListing(job_id)
+        self.scheduler.notify(job_id)
+        self.log(f"Successfully deployed custom job '{name}'", 'blue')
+        return job_id
+
+    def _enqueue (self, id):
+
+        '''
+        Marks a job as pending and hands it to the run queue,
+        the job is started by _admit once a slot is free.
+        '''
+
+        job = self.jobs[id]
+        job.pending = True
+        self.runqueue.push(id, job.priority, job.tags)
+
     def _enableJob (self, identifier, value):
 
         '''
@@ -255,31 +790,93 @@ class Core:
         '''
 
         # find the corresponding job
-        job = None
-        if identifier in self.jobs:
-            job = self.jobs[identifier]
-        else:
-            for j in self.jobs.values():
-                if j['name'] == identifier:
-                    job = j
+        job = self._findJob(identifier)
         
         # check if a job could be found
         if not job:
             self.log(f"No job was found for identifier '{identifier}'", 'red')
         else:
-            job['disabled'] = not value
+            with self.lock:
+                job.disabled = not value
+                self._recordChange(job.id, 'enable' if value else 'disable')
+                self._publish(lazy=True)
+            self.scheduler.notify(job.id)
             if value:
-                self.log(f"Successfully enabled '{job['name']}' ({job['id']}).", 'green')
+                self.log(f"Successfully enabled '{job.name}' ({job.id}).", 'green')
             else:
-                self.log(f"Successfully disabled '{job['name']}' ({job['id']}).", 'blue')
+                self.log(f"Successfully disabled '{job.name}' ({job.id}).", 'blue')
+
+    def _enableBatch (self, value, identifiers=None, pattern=None, tag=None, atomic=False):
+
+        '''
+        Enables (value True) or disables several jobs under a single lock
+        acquisition. The jobs are selected by a list of identifiers (ids or
+        names), a name glob pattern and/or a tag. With atomic, no job is
+        changed if any identifier is unknown.
+
+        RETURN
+        list of {'identifier', 'success', 'id', 'info'} dictionaries.
+        '''
+
+        results = []
+        with self.lock:
+            for identifier in identifiers or []:
+                job = self._findJob(identifier)
+                results.append({'identifier': identifier, 'success': bool(job), 'id': job.id if job else None,
+                                'info': '' if job else f"Identifier '{identifier}' not found."})
+            if pattern is not None or tag is not None:
+                for job in self.jobs.values():
+                    if pattern is not None and not fnmatchcase(job.name, pattern):
+                        continue
+                    if tag is not None and tag not in job.tags:
+                        continue
+                    results.append({'identifier': job.name, 'success': True, 'id': job.id, 'info': ''})
+            if atomic and not all(result['success'] for result in results):
+                for result in results:
+                    if result['success']:
+                        result['success'] = False
+                        result['info'] = 'Not applied, the batch contains unknown identifiers.'
+                return results
+            ids = {result['id'] for result in results if result['success']}
+            for id in ids:
+                self.jobs[id].disabled = not value
+                self._recordChange(id, 'enable' if value else 'disable')
+            self._publish(lazy=True)
+        self.scheduler.notifyMany(ids)
+        self.log(f"{'Enabled' if value else 'Disabled'} {len(ids)} jobs.", 'green' if value else 'blue')
+        return results
+
+    def _escalate (self):
+
+        '''
+        Escalation thread, blocks until the grace period of stopped
+        runs expires and kills their process groups if still alive.
+        '''
+
+        due = self.reaper.wait()
+        with self.lock:
+            runs = [self.stopping.pop(pid) for pid in due if pid in self.stopping]
+        for process, pgid in runs:
+            if Job.groupIsAlive(process, pgid):
+                self.log(f'Killing process group {pgid or process.pid}, it ignored SIGTERM.', 'red')
+                Job.signalGroup(process, pgid, signal.SIGKILL)
 
     def _findIdByName (self, name):
 
         job = self._findJobByName(name)
         if job:
-            return job['id']
+            return job.id
         return None
 
+    def _findJob (self, identifier):
+
+        '''
+        Returns the job corresponding to the identifier (id or name)
+        otherwise it returns None.
+        '''
+
+        return self.jobs.get(identifier) or self._findJobByName(identifier)
+
     def _findJobByName (self, name):
 
         '''
@@ -287,10 +884,7 @@ class Core:
         otherwise it returns None.
         '''
 
-        for job in self.jobs.values():
-            if name == job['name']:
-                return job
-        return None
+        return self.jobs.byName(name)
 
     def _generateJobId (self):
         
@@ -300,9 +894,8 @@ class Core:
         '''
         
         while True:
-            # 8 bytes seed
-            byte_seed = randint(0, 255, 8)
-            job_id = ''.join(''.join([hex(b) for b in byte_seed]).split('0x'))
+            # 8 random bytes, always 16 hex digits
+            job_id = urandom(8).hex()
             if job_id not in self.jobs:
                 return job_id
 
@@ -317,136 +910,686 @@ class Core:
         '''
 
         output = 'job\t\tactive\t\tdisabled\tcreated\t\t\tjob id'
-        for id, job in self.jobs.items():
+        waits = []
+        for id, job in list(self.jobs.items()):
             a_col = '\033[92m'
-            if not job["active"]: 
+            state = job.active
+            if job.pending:
+                a_col = '\033[93m'
+                state = 'pending'
+                waits.append(self.runqueue.wait(id))
+            elif not job.active: 
                 a_col = '\033[91m'
-            output += f'\n{job["name"]}\t\t{a_col}{job["active"]}\033[0m\t\t{job["disabled"]}\t\t{job["time_created"]}\t{id}'
+            output += f'\n{job.name}\t\t{a_col}{state}\033[0m\t\t{job.disabled}\t\t{job.time_created}\t{id}'
+        output += f'\n\nqueue depth: {self.runqueue.depth()}\tlongest wait: {max(waits, default=0):.1f}s'
         return output
     
-    def _listToJson (self):
+    def _loadConfig (self):
 
         '''
-        Lists all jobs compatible to json table format.
+        Loads the server configuration from config.json in the root directory.
         '''
-        
-        out = []
-        for job in self.jobs.values():        
-            out.append(job)
-        return out
+
+        try:
+            with open(self.rootDirectory + '/config.json') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            self.log(f'Could not load config.json, continue with defaults.', 'y')
+            return {}
 
     def _loadCustomJobs (self):
 
         '''
         Submethod which imports all custom job objects and deploys them.
+        The files are imported and checked in parallel by the loader.
         '''
 
         self.log(f'Load custom jobs from  {self.customDirectory} ...')
 
-        # load all file names
-        for file in listdir(self.customDirectory):
-            # check if the parsed node is a file
-            isFile = pathlib.Path(self.customDirectory+'/'+file).is_file()
-            if isFile and 'template' not in file and '__init__' not in file:
-                # override module string in relative python
-                # path fashion, so it is parsed correctly by importlib
-                module = f"jobs.custom.{file.replace('.py', '')}"
-                # try to import
-                try:
-                    # extract job object from the module
-                    spec = importlib.util.spec_from_file_location(module, self.customDirectory+'/'+file)
-                    custom_module = importlib.util.module_from_spec(spec)
-                    spec.loader.exec_module(custom_module)
-                    job = custom_module.CustomJob()
-                    # check before deploy if the dependecies are met
-                    if not job.dependencyCheck():
-                        self.log(f"No dependencies installed for custom job {module}, skip deployment ...", 'y')
-                        continue
-                    # ----- deploying -----
-                    # now an alternative deploy is performed
-                    # for this generate an id and name first
-                    job_id = self._generateJobId()
-                    name = self._suggestAllowedName(job.name)
-                    # for custom jobs there is no targetpath needed, since the
-                    # workload is triggered directly from the custom job object (method).
-                    # The target_path will be overriden with the path of the custom job file.
-                    target_path = self.customDirectory+'/'+file
-                    # deploy the job by appending the new job to the jobs object
-                    self.jobs[job_id] = {
-                        "active": job.active,
-                        "disabled": False,
-                        "finished": False,
-                        "id": job_id,
-                        "job": job,
-                        "name": name,
-                        "operating_time_window": None,                 
-                        "operating_week_days": 'all',
-                        "repeat": False,
-                        "repeat_sleep": 0,
-                        "target_path": target_path,
-                        "time_created": self._generateUTCTimestamp(),
-                        "time_duration": 0,
-                        "time_started": None,
-                        "time_stopped": None
-                    }
-                    self.log(f"Successfully deployed custom job '{name}'", 'blue')
-                except:
-                    self.log(f"Could not import custom job '{module}'\n{format_exc()}", 'red')
+        for path, status, result in self.loader.load():
+            module = self.loader.moduleName(path)
+            if status == 'missing':
+                self.log(f"No dependencies installed for custom job {module}, skip deployment ...", 'y')
+            elif status == 'failed':
+                self.log(f"Could not import custom job '{module}'\n{result}", 'red')
+            else:
+                self._deployCustomJob(path, result)
 
     def _manage (self):
         
         '''
         An automatic steering algorithm.
+        Blocks until the scheduler reports due jobs and only steps those,
+        so the work per wakeup does not grow with the number of deployed jobs.
+        '''
+
+        due = self.scheduler.wait()
+        with self.lock:
+            for id in due:
+                if id == self.admission_key:
+                    continue
+                try:
+                    self._manageJob(id)
+                except:
+                    self.log(format_exc(), 'red')
+            # start queued jobs for which slots became free
+            self._admit()
+            self._publish(lazy=True)
+
+    def _manageJob (self, id):
+
+        '''
+        Steers a single job.
         The pipe respects the active variable in the job object only if the job is not disabled
-        and will flip it according to the time operating window.
+        and will flip it according to the time operating window. Afterwards the next
+        deadline of the job is handed to the scheduler.
+        '''
+
+        job = self.jobs.get(id)
+        if not job:
+            self.scheduler.cancel(id)
+            return
+        now = datetime.now()
+        # override the current activity variable
+        # by measuring if the subprocess is alive.
+        was_active = job.active
+        job.active = job.job.isAlive()
+        if was_active and not job.active:
+            self.runqueue.release(id)
+            self._recordChange(id, 'finish', self._recordRun(id))
+            self._logFinished(id)
+        # a run which exceeds the timeout of the job is stopped
+        if job.active and job.timeout and job.run_started and time() >= job.run_started[0] + job.timeout:
+            self.log(f"Job '{job.name}' ({id}) timed out after {job.timeout}s.", 'red')
+            self._deactivateIfActive(id, status='timed_out')
+        # a disabled job is deactivated and waits
+        # for an enable event, no deadline needed.
+        if job.disabled:
+            self._deactivateIfActive(id)
+            self.scheduler.cancel(id)
+            self._persist(id)
+            return
+        # advance the cron schedule once its fire time passed
+        fire = False
+        if job.cron and job.next_run <= now.timestamp():
+            fire = True
+            job.next_run = job.cron.nextFire(now).timestamp()
+        # check for weekday and time window
+        if not job.operating_window.isOpen(now):
+            self._deactivateIfActive(id)
+        # scheduled jobs are queued at every fire time,
+        # unless the previous run is still alive or waiting.
+        elif job.cron:
+            if fire and not job.active and not job.pending:
+                self._enqueue(id)
+        # make sure that the job is finished in case
+        # that the job should not be repeated.
+        elif not job.active and not job.finished and not job.pending:
+            # queue the job for activation if it's not actively
+            # running and the finished flag was not enabled.
+            self._enqueue(id)
+        self._scheduleNext(id, now)
+        self._persist(id)
+
+    def _updateListing (self, id):
+
+        '''
+        Re-serializes a job and bumps the revision if its view changed.
+        '''
+
+        job = self._serializeJob(self.jobs[id])
+        entry = self.listing.get(id)
+        if entry and entry[1] == job:
+            return
+        revision = self._nextRevision()
+        if (entry is not None and entry[1]['pending']) != job['pending']:
+            self.queue_depth += 1 if job['pending'] else -1
+        if not entry:
+            insort(self.listing_order, id)
+            self.removed.pop(id, None)
+            self.order_dirty = True
+        self.listing[id] = (revision, job, json.dumps(job, default=str))
+        self.listing_dirty = True
+
+    def _upcomingRuns (self, job, now, count):
+
+        '''
+        Generator of (time, id, name) tuples for the next count
+        cron fire times of a job which lie within its operating window.
+        '''
+
+        for t in job.cron.nextFires(now, count):
+            if job.operating_window.isOpen(t):
+                yield t, job.id, job.name
+
+    def _logFinished (self, id):
+
+        '''
+        Logs the outcome of a job which stopped on its own.
+        '''
+
+        job = self.jobs[id]
+        # check if errors or exceptions might have
+        # caused the job to finish.
+        if job.job._exceptionOccured():
+            self.log(f"Job '{job.name}' ({id}) finished due to errors (exit code {job.job.returncode}):", 'red')
+            stderr = job.job.output()['stderr']
+            if stderr:
+                self.log(stderr, 'red', indent=1)
+        else:
+            self.log(f"Job '{job.name}' ({id}) finished successfully.", 'green')
+
+    def _nextRevision (self):
+
+        '''
+        Bumps the revision shared by the listing and the change log.
+        '''
+
+        with self.changed:
+            self.revision += 1
+            return self.revision
+
+    def _onExit (self, id, process, returncode, timestamp):
+
+        '''
+        Supervisor callback, records the exit status of a job subprocess
+        and lets the manager handle the job right away. The exit of a
+        stopped run completes its history row instead.
+        '''
+
+        job = self.jobs.get(id)
+        if not job or job.job.subprocess is not process:
+            # the lock waits for a stop which is just recording the run
+            with self.lock:
+                run = self.exiting.pop(process.pid, None)
+            if run:
+                id, start_wall, start_monotonic, status, output_bytes = run
+                self.store.putRun(id, start_wall, timestamp, start_monotonic, monotonic() - (time() - timestamp),
+                                  returncode, status, output_bytes)
+            return
+        job.job.returncode = returncode
+        job.job.time_exited = timestamp
+        self.scheduler.notify(id)
+
+    def _openRunLog (self, id):
+
+        '''
+        Creates the log file for a new run of the job and
+        removes the oldest runs beyond log_max_runs.
+        '''
+
+        directory = f'{self.logDirectory}/{id}'
+        makedirs(directory, exist_ok=True)
+        pruneRuns(directory, self.log_max_runs - 1)
+        run = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        return RunLog(f'{directory}/{run}.log', self.log_max_bytes, self.log_backup_count)
+
+    def _persist (self, id):
+
+        '''
+        Hands the definition and runtime state of a job to the store,
+        custom jobs are not persisted since they are loaded from files.
+        '''
+
+        self._updateListing(id)
+        job = self.jobs[id]
+        if not job.definition:
+            return
+        process = job.job.subprocess
+        state = {
+            'active': job.active,
+            'disabled': job.disabled,
+            'finished': job.finished,
+            'last_status': job.last_status,
+            'pid': process.pid if process and job.active else None,
+            'start_time': job.job.start_time if job.active else None,
+            'run_started': job.run_started[0] if job.active and job.run_started else None,
+            'fifo': job.job.fifo if job.active else None,
+            'time_started': job.time_started,
+            'time_stopped': job.time_stopped,
+            'time_duration': job.time_duration
+        }
+        self.store.put(id, job.definition, state)
+
+    def _parseOptions (self, requestObject):
+
+        '''
+        Validates the optional parameters of a deploy request and compiles
+        the schedule and operating window, see deploy for the format.
+
+        RETURN
+        (True, dict of job record fields) or (False, info message)
         '''
 
+        stdout = ''
+
+        # -- optional parameters --
+        if "active" in requestObject:
+            active = requestObject["active"]
+            if type(active) is not bool:
+                stdout = f"active must be boolean!"
+        else:
+            active = False
+        if "disable" in requestObject:
+            disable = requestObject["disable"]
+            if type(disable) is not bool:
+                stdout = f"disable must be boolean!"
+        else:
+            disable = False
+        if "operating_time_window" in requestObject:
+            operating_time_window = requestObject["operating_time_window"]
+            if type(operating_time_window) is not list or len(operating_time_window) != 2:
+                stdout = f"'operating_time_window' wrongly specified! Need a valid time window e.g. '[12:00, 14:30]'"
+        else:
+            operating_time_window = None
+        if "operating_week_days" in requestObject:
+            operating_week_days = requestObject["operating_week_days"]
+            if type(operating_week_days) is not list:
+                stdout = f"'operating_week_days' must be a list of strings ['mon', 'tue',..]!"
+            else:
+                operating_week_days = [d.lower()[:3] for d in operating_week_days]
+        else:
+            operating_week_days = 'all'
+        if "repeat" in requestObject:
+            repeat = requestObject["repeat"]
+            if type(repeat) is not bool:
+                stdout = f"repeat must be boolean!"
+        else:
+            repeat = False
+        if "repeat_sleep" in requestObject:
+            repeat_sleep = requestObject["repeat_sleep"]
+            if type(repeat_sleep) is not int or repeat_sleep < 0:
+                stdout = f"repeat_sleep must be a positive integer!"
+        else:
+            repeat_sleep = 0
+        if "priority" in requestObject:
+            priority = requestObject["priority"]
+            if type(priority) is not int:
+                stdout = f"priority must be an integer!"
+        else:
+            priority = 0
+        if "tags" in requestObject:
+            tags = requestObject["tags"]
+            if type(tags) is not list or not all(type(t) is str for t in tags):
+                stdout = f"tags must be a list of strings!"
+        else:
+            tags = []
+        if "schedule" in requestObject:
+            schedule = requestObject["schedule"]
+            if type(schedule) is not str:
+                stdout = f"schedule must be a cron expression string e.g. '*/5 * * * *'!"
+        else:
+            schedule = None
+        if "timeout" in requestObject:
+            timeout = requestObject["timeout"]
+            if type(timeout) not in (int, float) or timeout <= 0:
+                stdout = f"timeout must be a positive number of seconds!"
+        else:
+            timeout = None
+        if stdout != '':
+            return False, stdout
+
+        # compile the cron expression into bitsets
+        # and compute the first fire time.
+        cron, next_run = None, None
+        if schedule:
+            try:
+                cron = CronSchedule(schedule)
+                next_run = cron.nextFire(datetime.now()).timestamp()
+            except ValueError as e:
+                return False, str(e)
+
+        # compile the operating window once, jobs with the same window share
+        # it. This also validates the day and time strings.
         try:
-            current_hour = datetime.now().hour
-            current_minute = datetime.now().minute
-            week_day = datetime.today().strftime('%A').lower()[:3]
-            for id in self.jobs.keys():
-                # override the current activity variable
-                # by measuring if the subprocess is alive.
-                # This ensures that isAlive() method will not be called inflationary.
-                job = self.jobs[id]
-                job['active'] = job['job'].isAlive()
-                # skip this job if it is disabled on purpose,
-                # also make sure everything is deactivated.
-                if job['disabled']:
-                    self._deactivateIfActive(id)
-                    continue
-                # check for weekday and skip if the current day is not included
-                if job["operating_week_days"] != 'all' and week_day not in job["operating_week_days"]:
+            operating_window = OperatingWindow.shared(operating_week_days, operating_time_window)
+        except (ValueError, AttributeError, TypeError) as e:
+            return False, f"Operating window wrongly specified! {e}"
+
+        return True, {
+            'active': active,
+            'disabled': disable,
+            'operating_time_window': operating_time_window,
+            'operating_week_days': operating_week_days,
+            'operating_window': operating_window,
+            'cron': cron,
+            'next_run': next_run,
+            'priority': priority,
+            'repeat': repeat,
+            'repeat_sleep': repeat_sleep,
+            'schedule': schedule,
+            'tags': tags,
+            'timeout': timeout
+        }
+
+    def _prepareJob (self, requestObject, job_id=None):
+
+        '''
+        Validates a deploy request and builds the job record without adding
+        it, see deploy for the request format.
+
+        RETURN
+        (True, JobRecord) or (False, info message)
+        '''
+
+        stdout = ''
+
+
+        ''' Request Policy Check '''
+        # -- mandatory parameters --
+        for p in self.mandatory_parameters:
+            if p not in requestObject:
+                stdout = f'Key "{p}" not specified, the mandatory request parameters are {self.mandatory_parameters}'
+                return False, stdout
+
+        success, options = self._parseOptions(requestObject)
+        if not success:
+            return False, options
+
+        # -- certain parameters --
+        # the name is made unique once the job is added
+        name = requestObject.get('name', 'Job')
+
+        # create a dedicated job id
+        if not job_id:
+            job_id = self._generateJobId()
+            # denote creation time
+            requestObject['time_created'] = self._generateUTCTimestamp()
+        time_created = requestObject['time_created']
+        # pass the id to the request object
+        # so that the Job object can use it
+        # via the request object.
+        requestObject['id'] = job_id
+        # create a process object (will run internal type tests)
+        try:
+            job_object = Job(requestObject, self.zygote, self.output_buffer_size, self.cgroups)
+        except (ValueError, TypeError) as e:
+            return False, str(e)
+        limits = job_object.limits
+        if limits and (limits.max_memory or limits.cpu_quota) and self.cgroups and self.cgroups.available is None:
+            if self.cgroups.setup():
+                self.log(f'Resource limits are applied through cgroups in {self.cgroups.jobs}.')
+        if limits and limits.cpu_quota and not (self.cgroups and self.cgroups.available):
+            self.log(f"cpu_quota of job '{name}' is not enforced, it needs cgroup v2.", 'y')
+
+        operating_window = options.pop('operating_window')
+        return True, JobRecord(
+            job_id, name, job_object, requestObject['target_path'], time_created, operating_window,
+            definition=dict({p: requestObject[p] for p in self.definition_parameters if p in requestObject}, name=name),
+            **options
+        )
+
+    def _publish (self, lazy=False):
+
+        '''
+        Publishes the listing as a new immutable snapshot, the caller holds
+        the lock. Publishing copies the listing, so write sections publish
+        lazily: only if the last snapshot is older than publish_interval.
+        Readers publish the remaining changes on demand (see _snapshot).
+        '''
+
+        if not self.listing_dirty:
+            return
+        if lazy and monotonic() - self.published_at < self.publish_interval:
+            return
+        order = tuple(self.listing_order) if self.order_dirty else self.published.order
+        self.published = JobSnapshot(self.revision, dict(self.listing), order, dict(self.removed), self.removed_floor,
+                                     self.queue_depth)
+        self.published_at = monotonic()
+        self.listing_dirty = self.order_dirty = False
+
+    def _recordChange (self, id, event, info=None):
+
+        '''
+        Appends a job event to the change log and wakes up followers.
+        '''
+
+        self.listing_dirty = True
+        job = self.jobs.get(id)
+        with self.changed:
+            # the revision is taken and appended in one step so the log
+            # stays ordered for followers reading concurrently
+            self.revision += 1
+            if len(self.changes) == self.changes.maxlen:
+                self.changes_floor = self.changes[0]['revision']
+            self.changes.append({'revision': self.revision, 'time': time(), 'event': event,
+                                 'id': id, 'name': job.name if job else None, 'info': info})
+            self.changed.notify_all()
+
+    def _recordRun (self, id, status=None, exiting=None):
+
+        '''
+        Closes the current run of a job: denotes stop time and duration
+        and appends the run to the history. Without a status, the run
+        counts as 'failed' if errors occured, otherwise as 'success'.
+        exiting is the process of a stopped run which did not exit yet,
+        its history row is written once its exit is reported (see _onExit).
+        Returns the status or None if no run was open.
+        '''
+
+        job = self.jobs[id]
+        self.sampler.unwatch(id)
+        if not job.run_started:
+            return
+        start_wall, start_monotonic = job.run_started
+        job.run_started = None
+        process = job.job
+        # prefer the exit time reported by the supervisor
+        end_wall = getattr(process, 'time_exited', None) or time()
+        end_monotonic = monotonic() - (time() - end_wall)
+        output_bytes = 0
+        if isinstance(process, Job):
+            # the manager may have reaped the process by poll() before
+            # the supervisor reported its exit
+            if process.returncode is None and process.subprocess:
+                process.returncode = process.subprocess.returncode
+            # open pipes are still drained, only their paths go
+            process.removeFifos()
+            output_bytes = process.stdout.end + process.stderr.end
+            if status is None and process.limitExceeded():
+                status = 'memory_exceeded'
+            elif status is None:
+                status = 'failed' if process._exceptionOccured() else 'success'
+        job.time_stopped = self._generateUTCTimestamp()
+        job.time_duration = end_monotonic - start_monotonic
+        job.last_status = status or 'success'
+        if exiting:
+            self.exiting[exiting.pid] = (id, start_wall, start_monotonic, status or 'success', output_bytes)
+        else:
+            self.store.putRun(id, start_wall, end_wall, start_monotonic, end_monotonic,
+                              getattr(process, 'returncode', None), status or 'success', output_bytes)
+        return status or 'success'
+
+    def _reloadCustomJobs (self):
+
+        '''
+        Watcher step, applies added, changed and removed custom job files.
+        Only the affected files are imported, the job of a changed file
+        keeps its id and name and gets the new CustomJob instance swapped
+        in, all other jobs are not touched.
+        '''
+
+        added, changed, removed = self.loader.changes()
+        if not added and not changed and not removed:
+            return
+        # the files are imported before the lock is taken
+        loaded = self.loader.load(added + changed) if added or changed else []
+        with self.lock:
+            self._swapCustomJobs(removed, loaded)
+            self._publish(lazy=True)
+
+    def _swapCustomJobs (self, removed, loaded):
+
+        '''
+        Removes the jobs of removed files and swaps in or
+        deploys the jobs of loaded files.
+        '''
+
+        for path in removed:
+            id = self.customJobs.pop(path, None)
+            if id in self.jobs:
+                self._deactivateIfActive(id)
+                self._removeJob(id)
+                self.log(f"Removed custom job {self.loader.moduleName(path)}.", 'blue')
+        for path, status, result in loaded:
+            module = self.loader.moduleName(path)
+            id = self.customJobs.get(path)
+            if status == 'failed':
+                # a broken edit keeps the previous instance running
+                self.log(f"Could not reload custom job '{module}'\n{result}", 'red')
+            elif status == 'missing':
+                self.log(f"No dependencies installed for custom job {module}, skip deployment ...", 'y')
+                if id in self.jobs:
                     self._deactivateIfActive(id)
+                    self._removeJob(id)
+                    del self.customJobs[path]
+            elif id in self.jobs:
+                job = self.jobs[id]
+                self._deactivateIfActive(id)
+                job.job = result
+                job.active = False
+                job.finished = False
+                self._recordChange(id, 'reload')
+                self.scheduler.notify(id)
+                self.log(f"Reloaded custom job '{job.name}' ({id}).", 'blue')
+            else:
+                self._deployCustomJob(path, result)
+
+    def _removeJob (self, id):
+
+        '''
+        Removes a job from the table and the store and leaves
+        a tombstone for listing deltas.
+        '''
+
+        self._recordChange(id, 'remove')
+        self.scheduler.cancel(id)
+        self.sampler.forget(id)
+        if self.cgroups:
+            self.cgroups.remove(id)
+        if self.jobs[id].definition:
+            self.store.delete(id)
+        self.jobs.remove(id)
+        entry = self.listing.pop(id, None)
+        if entry:
+            if entry[1]['pending']:
+                self.queue_depth -= 1
+            del self.listing_order[bisect_left(self.listing_order, id)]
+            self.listing_dirty = self.order_dirty = True
+            self.removed[id] = self._nextRevision()
+            while len(self.removed) > self.removed_max:
+                oldest = next(iter(self.removed))
+                self.removed_floor = self.removed.pop(oldest)
+
+    def _restoreJobs (self):
+
+        '''
+        Re-deploys the jobs of the store and re-attaches to
+        their processes which are still running.
+        '''
+
+        for id, definition, state in self.store.load():
+            try:
+                success, info = self.deploy(dict(definition), id)
+                if not success:
+                    self.log(f"Could not restore job '{definition['name']}' ({id}): {info}", 'red')
                     continue
-                # check for time
-                if job["operating_time_window"]:
-                    if current_hour < int(job["operating_time_window"][0].split(':')[0]) or current_hour > int(job["operating_time_window"][1].split(':')[0]):
-                        self._deactivateIfActive(id)
-                        continue
-                    if current_minute < int(job["operating_time_window"][0].split(':')[1]) or current_minute > int(job["operating_time_window"][1].split(':')[1]):
-                        self._deactivateIfActive(id)
-                        continue
-                # make sure that the job is finished in case
-                # that the job should not be repeated.
-                if not job['active'] and not job['finished']:
-                    # activate the job if it's not actively running
-                    # and the finished flag was not enabled.
-                    self._activateIfDeactivated(id)
-                    if not job['repeat']:
-                        # set the finished flag to true already
-                        # to avoid another trigger in the next round
-                        job['finished'] = True
-                        # check if errors or exceptions might have
-                        # caused the job to finish.
-                        if job['job']._exceptionOccured():
-                            self.log(f"Job '{job['name']}' ({id}) finished due to errors:", 'red')
-                            self.log(job['job'].output()['stderr'], 'red', indent=1)
-                        else:
-                            self.log(f"Job '{job['name']}' ({id}) finished successfully.", 'green')
-        except:
-            self.log(format_exc(), 'red')
+                job = self.jobs[id]
+                job.disabled = state['disabled']
+                job.finished = state['finished']
+                job.last_status = state.get('last_status')
+                job.time_started = state['time_started']
+                job.time_stopped = state['time_stopped']
+                job.time_duration = state['time_duration']
+                if state['active'] and state['pid'] and job.job.attach(state['pid'], state['start_time'], state.get('fifo')):
+                    job.active = True
+                    # the run continues, stores of older servers lack its start
+                    started = state.get('run_started') or time()
+                    job.run_started = (started, monotonic() - (time() - started))
+                    self.runqueue.occupy(id, job.tags)
+                    self.supervisor.watch(id, job.job.subprocess)
+                    if job.job.pgid:
+                        self.sampler.watch(id, job.job.pgid, baseline=True)
+                    # the output continues in the log of the run
+                    if job.job.outputs:
+                        log = RunLog(f'{job.job.fifo}.log', self.log_max_bytes, self.log_backup_count)
+                        self.capture.watch(job.job.outputs[0], job.job.stdout, log)
+                        self.capture.watch(job.job.outputs[1], job.job.stderr, log)
+                    self.log(f"Re-attached job '{job.name}' ({id}) to running process {state['pid']}.", 'blue')
+                else:
+                    job.active = False
+                self._persist(id)
+            except:
+                self.log(f"Could not restore job {id}\n{format_exc()}", 'red')
+        
+    def _snapshot (self):
+
+        '''
+        Returns the latest published snapshot. Pending changes are published
+        first if the lock is free, a reader never waits for the writer but
+        may get the snapshot of the last finished write instead.
+        '''
+
+        if self.listing_dirty and self.lock.acquire(blocking=False):
+            try:
+                self._publish()
+            finally:
+                self.lock.release()
+        return self.published
+
+    def _scheduleNext (self, id, now):
+
+        '''
+        Computes the next state transition of a job, which is either the next
+        flip of its operating window, the next cron fire time, the timeout of
+        the running run or, while a custom job is running, the next exit check.
+        '''
+
+        job = self.jobs[id]
+        deadlines = []
+        transition = job.operating_window.nextTransition(now)
+        if transition:
+            deadlines.append(transition.timestamp())
+        if job.active and not isinstance(job.job, Job):
+            deadlines.append(time() + self.poll_interval)
+        if job.active and job.timeout and job.run_started:
+            deadlines.append(job.run_started[0] + job.timeout)
+        if job.cron:
+            deadlines.append(job.next_run)
+        if deadlines:
+            self.scheduler.schedule(id, min(deadlines))
+        else:
+            self.scheduler.cancel(id)
+
+    def _serializeJob (self, job):
+
+        '''
+        JSON compatible view of a job record, the live objects (process,
+        compiled window and schedule) are left out.
+        '''
+
+        out = {field: getattr(job, field) for field in JobRecord.__slots__ if field not in ('job', 'operating_window', 'cron')}
+        # copies, the cached view must not change along with the record
+        out['definition'] = dict(job.definition) if job.definition else None
+        out['tags'] = list(job.tags)
+        process = getattr(job.job, 'subprocess', None)
+        out['pid'] = process.pid if process and job.active else None
+        out['queued_at'] = self.runqueue.enqueued(job.id)
+        return out
+
+    def _stopRun (self, run, grace):
+
+        '''
+        Hands a stopped (process, pgid) run to the escalation,
+        which kills it once the grace period expired.
+        '''
+
+        process, pgid = run
+        if grace <= 0:
+            Job.signalGroup(process, pgid, signal.SIGKILL)
+            return
+        self.stopping[process.pid] = run
+        self.reaper.schedule(process.pid, time() + grace)
 
     def _suggestAllowedName (self, name):
 
@@ -457,20 +1600,4 @@ class Core:
         Further calls will produce 'process_2', 'process_3' and so on.
         '''
 
-        name_copy = name
-        while name_copy in self.jobs:
-            try:
-                # check if an integer was appended already at the end
-                last_id = int(name_copy.split('_')[-1])
-                
-                # new id is generated by incrementation of the last id
-                id = last_id + 1
-
-                # build new name 
-                name_copy = name_copy.split('_')
-                name_copy[-1] = id
-                name_copy = ''.join(name_copy)
-            except:
-                name_copy = name_copy + '_1'
-            
-        return name_copy
+        return self.jobs.suggestName(name)
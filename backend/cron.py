@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from datetime import datetime, timedelta
+
+class CronSchedule:
+
+    '''
+    Standard 5-field cron expression compiled into one bitset per field.
+    The next fire time is computed directly from the bitsets by jumping to
+    the next set bit of each field instead of probing minute by minute.
+
+    FORMAT
+    'minute hour day-of-month month day-of-week'
+    e.g. '*/5 * * * *', '0 2 * * mon-fri', '30 8 1,15 * *'
+    '''
+
+    fields = [
+        ('minute', 0, 59),
+        ('hour', 0, 23),
+        ('day of month', 1, 31),
+        ('month', 1, 12),
+        ('day of week', 0, 7)
+    ]
+    names = {
+        'month': ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'],
+        'day of week': ['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat']
+    }
+
+    def __init__ (self, expression):
+
+        self.expression = expression
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"'{expression}' is not a valid cron expression, 5 fields are needed.")
+        self.minutes, self.hours, self.days, self.months, self.week_days = [
+            self._parseField(part, *field) for part, field in zip(parts, self.fields)
+        ]
+        # sunday is 0 and 7, internally monday = 0 as in datetime
+        sunday = self.week_days & 1 or self.week_days >> 7 & 1
+        self.week_days = (self.week_days >> 1 & 0b111111) | (sunday << 6)
+        # according to cron, if both day fields are restricted
+        # a day matches if either of them matches
+        self.days_restricted = not parts[2].startswith('*')
+        self.week_days_restricted = not parts[4].startswith('*')
+
+    def nextFire (self, dt):
+
+        '''
+        Returns the first datetime strictly after dt which matches the expression.
+        '''
+
+        dt = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # the search is bounded, a day matching e.g. feb 29th
+        # on a specific week day can be years away.
+        limit = dt.year + 28
+        while dt.year <= limit:
+            month = self._nextBit(self.months, dt.month)
+            if month is None:
+                dt = datetime(dt.year + 1, 1, 1)
+                continue
+            if month != dt.month:
+                dt = datetime(dt.year, month, 1)
+            if not self._matchesDay(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            hour = self._nextBit(self.hours, dt.hour)
+            if hour is None:
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if hour != dt.hour:
+                dt = dt.replace(hour=hour, minute=0)
+            minute = self._nextBit(self.minutes, dt.minute)
+            if minute is None:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+                continue
+            return dt.replace(minute=minute)
+        raise ValueError(f"'{self.expression}' never fires.")
+
+    def nextFires (self, dt, count):
+
+        '''
+        Generator of the next count fire times after dt.
+        '''
+
+        for _ in range(count):
+            dt = self.nextFire(dt)
+            yield dt
+
+    # - private methods
+    def _matchesDay (self, dt):
+
+        '''
+        Checks the day of month and day of week fields.
+        '''
+
+        day = self.days >> dt.day & 1
+        week_day = self.week_days >> dt.weekday() & 1
+        if self.days_restricted and self.week_days_restricted:
+            return bool(day or week_day)
+        return bool(day and week_day)
+
+    def _nextBit (self, bits, value):
+
+        '''
+        Returns the lowest set bit index >= value or None.
+        '''
+
+        masked = bits >> value << value
+        if not masked:
+            return None
+        return (masked & -masked).bit_length() - 1
+
+    def _parseField (self, part, name, low, high):
+
+        '''
+        Parses a single cron field (lists, ranges, steps and names)
+        into an integer bitset.
+        '''
+
+        bits = 0
+        for item in part.lower().split(','):
+            step = 1
+            if '/' in item:
+                item, step = item.split('/')
+                step = int(step)
+                if step < 1:
+                    raise ValueError(f"Invalid step in {name} field '{part}'.")
+            if item == '*':
+                start, end = low, high
+            elif '-' in item:
+                start, end = [self._parseValue(v, name) for v in item.split('-')]
+            else:
+                start = self._parseValue(item, name)
+                end = high if step > 1 else start
+            if not (low <= start <= end <= high):
+                raise ValueError(f"Invalid {name} field '{part}', values must lie within {low}-{high}.")
+            for v in range(start, end + 1, step):
+                bits |= 1 << v
+        return bits
+
+    def _parseValue (self, value, name):
+
+        '''
+        Converts a numeric or named (jan, mon, ..) field value to int.
+        '''
+
+        if name in self.names and value[:3] in self.names[name]:
+            return self.names[name].index(value[:3]) + (1 if name == 'month' else 0)
+        try:
+            return int(value)
+        except ValueError:
+            raise ValueError(f"Invalid value '{value}' in {name} field.")
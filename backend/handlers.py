@@ -2,11 +2,13 @@
 # -*- coding: utf-8 -*-
 
 from backend.core import Core
-from numpy.random import randint
 from traceback import format_exc
 from pathlib import Path
-import http.server, cgi
+from urllib.parse import urlsplit, parse_qs
+import http.server
+import hashlib
 import json
+import re
 
 __root__ = str(Path(__file__).parent.parent.resolve()) 
 
@@ -36,6 +38,20 @@ class APIHandler(http.server.BaseHTTPRequestHandler):
     '''
 
     Core = __core__
+    # persistent (keep-alive) connections, every response
+    # carries a Content-Length or closes the connection.
+    protocol_version = 'HTTP/1.1'
+    # idle keep-alive connections are closed after this time
+    timeout = 10
+    # a stream or long-poll which the server runs on its own thread
+    detached = None
+    # headers and body are written separately, avoid delayed acks
+    disable_nagle_algorithm = True
+    # upper bound (seconds) for long-polls, below the keep-alive timeout
+    max_wait = 9
+    # optional parameters of the ls request
+    ls_options = ['fields', 'active', 'disabled', 'name_prefix', 'tag', 'cursor', 'limit', 'since_revision']
+
     def do_POST (self):
 
         self.Core.log(f"New request by {self.client_address[0]} ...")
@@ -45,15 +61,20 @@ class APIHandler(http.server.BaseHTTPRequestHandler):
         # and then send back to client.
         responseObject = {'response': '', 'errors': []}
 
-        # communicate header
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        ctype, _ = cgi.parse_header(self.headers['Content-Type'])
+        # the status is sent together with the complete
+        # response, which allows persistent connections.
+        status = 200
+        # listings carry their revision as ETag and may
+        # be answered with a pre-serialized json body
+        etag, body = None, None
+        # long-polls are answered from their own thread
+        deferred = None
+        ctype = self.headers.get_content_type()
         
         # reject non-json content
         if ctype != 'application/json':
-            self.send_response(400)
-            self.end_headers()
+            self.close_connection = True
+            self._sendEmpty(400)
             return
 
         # extract json package
@@ -61,7 +82,8 @@ class APIHandler(http.server.BaseHTTPRequestHandler):
         # this dictionary will be the extracted request object
         #print('headers', self.headers) # for testing
         jsonPkg = json.loads(self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8'))
-        print('json', jsonPkg)
+        if type(jsonPkg) is str:
+            jsonPkg = json.loads(jsonPkg)
         requestObject = jsonPkg; 
 
         try:
@@ -69,11 +91,39 @@ class APIHandler(http.server.BaseHTTPRequestHandler):
             '''
             determine request type
                 - request: will add a request object
-                - ls: list all jobs with info
+                - ls: list all jobs with info, optionally projected
+                  (fields), filtered (active, disabled, name_prefix, tag),
+                  paginated (cursor, limit) or as delta (since_revision)
                 - set: set a specific argument
+                - next_runs: upcoming executions of scheduled jobs
+                - logs: last lines of a job's run log
+                - history: finished runs with aggregates
+                - deploy_batch, enable_batch, disable_batch: several
+                  jobs at once with per-item results
+                - changes_since: job events after a revision, waits up
+                  to 'wait' seconds for new events (long-poll)
+                - halt: disables all jobs and stops their runs within
+                  one deadline (seconds)
+                - stats: cpu, memory and i/o usage of one or all jobs
+                - remove: stops a job and removes it for good
             '''
             if requestObject['request'].lower() == 'ls':
-                responseObject['response'] = self.Core._listToJson()
+                options = {k: requestObject[k] for k in self.ls_options if k in requestObject}
+                if options:
+                    listing = self.Core.listJobs(**options)
+                    # the same revision looks different per projection, filter and
+                    # page. Stats and queue waits change outside of the revision,
+                    # so a listing with them never counts as unchanged.
+                    if 'stats' not in (options.get('fields') or ()) and not any('wait' in job for job in listing['jobs']):
+                        digest = hashlib.sha1(json.dumps(options, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+                        etag = f'"{listing["revision"]}-{digest[:16]}"'
+                    responseObject['response'] = listing
+                else:
+                    revision, jobs = self.Core.listJson()
+                    etag = f'"{revision}"'
+                    body = f'{{"response": {jobs}, "errors": []}}'
+                if etag and self.headers.get('If-None-Match') == etag:
+                    status = 304
             elif requestObject['request'].lower() == 'deploy':
                 self.Core.log(f"Deploying new job ...", 'y')
                 success, info = self.Core.deploy(requestObject)
@@ -83,25 +133,91 @@ class APIHandler(http.server.BaseHTTPRequestHandler):
                 else:
                     self.Core.log(info, 'red')  
                     responseObject['errors'].append(info)      
-            elif requestObject['request'].lower() == 'disable':
+            elif requestObject['request'].lower() == 'deploy_batch':
+                jobs = requestObject.get('jobs')
+                if type(jobs) is not list or not all(type(job) is dict for job in jobs):
+                    responseObject['errors'].append("jobs must be a list of deploy request objects.")
+                else:
+                    results = self.Core.deployBatch(jobs, requestObject.get('atomic', False))
+                    responseObject['response'] = results
+                    self._batchErrors(results, responseObject)
+            elif requestObject['request'].lower() in ('enable_batch', 'disable_batch'):
+                identifiers = requestObject.get('ids', []) + requestObject.get('names', [])
+                pattern, tag = requestObject.get('name_glob'), requestObject.get('tag')
+                if not identifiers and pattern is None and tag is None:
+                    responseObject['errors'].append("No selection (ids, names, name_glob or tag) provided.")
+                else:
+                    batch = self.Core.enableBatch if requestObject['request'].lower() == 'enable_batch' else self.Core.disableBatch
+                    results = batch(identifiers, pattern, tag, requestObject.get('atomic', False))
+                    responseObject['response'] = results
+                    self._batchErrors(results, responseObject)
+            elif requestObject['request'].lower() in ('enable', 'disable'):
                 if 'name' in requestObject:
                     identifier = requestObject['name']
                     if not self.Core._findIdByName(identifier):
                         responseObject['errors'].append(f"Identifier '{identifier}' not found.")
                 elif 'id' in requestObject:
                     identifier = requestObject['id']
-                    if identifier not in self.jobs:
+                    if identifier not in self.Core.jobs:
                         responseObject['errors'].append(f"Identifier '{identifier}' not found.")
                 else:
                     err = f"No identifier (name, or id needed) provided."
                     responseObject['errors'].append(err)
-                # disable the job if the identifier search yields no errors
+                # enable/disable the job if the identifier search yields no errors
                 if len(responseObject['errors']) == 0:
-                    self.Core.disable(identifier)
+                    if requestObject['request'].lower() == 'enable':
+                        self.Core.enable(identifier)
+                    else:
+                        self.Core.disable(identifier)
+            elif requestObject['request'].lower() == 'history':
+                identifier = requestObject.get('name', requestObject.get('id'))
+                history = self.Core.history(identifier, requestObject.get('since'), requestObject.get('until'),
+                                            requestObject.get('status'), requestObject.get('cursor'), requestObject.get('limit', 100))
+                if history is None:
+                    responseObject['errors'].append(f"Identifier '{identifier}' not found.")
+                else:
+                    responseObject['response'] = history
+            elif requestObject['request'].lower() == 'logs':
+                identifier = requestObject.get('name', requestObject.get('id'))
+                logs = self.Core.logs(identifier, requestObject.get('lines', 100), requestObject.get('run'))
+                if logs is None:
+                    responseObject['errors'].append(f"Identifier '{identifier}' not found.")
+                else:
+                    responseObject['response'] = logs
+            elif requestObject['request'].lower() == 'changes_since':
+                revision = requestObject.get('revision', 0)
+                wait = min(requestObject.get('wait', 0), self.max_wait)
+                if wait > 0:
+                    deferred = lambda: self._sendResponse(200, {'response': self.Core.waitChanges(revision, wait), 'errors': []})
+                else:
+                    responseObject['response'] = self.Core.changesSince(revision, requestObject.get('limit', 1000))
+            elif requestObject['request'].lower() == 'stats':
+                identifier = requestObject.get('name', requestObject.get('id'))
+                stats = self.Core.stats(identifier)
+                if stats is None:
+                    responseObject['errors'].append(f"Identifier '{identifier}' not found.")
+                else:
+                    responseObject['response'] = stats
+            elif requestObject['request'].lower() == 'next_runs':
+                count = requestObject.get('count', 10)
+                identifier = requestObject.get('name', requestObject.get('id'))
+                responseObject['response'] = self.Core.nextRuns(count, identifier)
+            elif requestObject['request'].lower() == 'halt':
+                self.Core.log(f"{self.client_address[0]} requested a halt of all jobs.", 'y')
+                result = self.Core.halt(requestObject.get('deadline'))
+                responseObject['response'] = (f"Halted all jobs in {result['seconds']:.2f}s, {result['stopped']} runs stopped, "
+                                              f"{result['killed']} killed after the deadline.")
+            elif requestObject['request'].lower() == 'remove':
+                identifier = requestObject.get('name', requestObject.get('id'))
+                success, info = self.Core.remove(identifier)
+                if success:
+                    responseObject['response'] = info
+                else:
+                    responseObject['errors'].append(info)
             elif requestObject['request'].lower() == 'ping':
                 responseObject['response'] = self.Core.ping_response
             elif requestObject['request'].lower() == 'config':
-                self.Core.log(f"{self.client_address[0]} requested an argument change in '{requestObject['name']}' job.", 'y')
+                self.Core.log(f"{self.client_address[0]} requested an argument change in '{requestObject.get('name', requestObject.get('id'))}' job.", 'y')
                 # get the correct id of the job depending on variables
                 if 'name' in requestObject:
                         id = self.Core._findIdByName(requestObject['name'])
@@ -111,45 +227,250 @@ class APIHandler(http.server.BaseHTTPRequestHandler):
                         raise KeyError('No name nor id was provided!')    
                 # unpack the argument and value
                 arg, val = requestObject['argument']
-                # apply
-                self.Core.jobs[id][arg] = val       
+                # apply and let the manager re-evaluate the job
+                success, info = self.Core.configure(id, arg, val)
+                if not success:
+                    responseObject['errors'].append(info)
             else:
-                self.send_response(403)
+                status = 403
             
         except:
             
             # inform the client that an exception occured, without details.
             err = f'An exception occured during the request.'
-            requestObject['errors'].append(err)
+            responseObject['errors'].append(err)
             # log server-side console with details.
             self.Core.log(err + '\n' + format_exc(), 'red') 
 
         finally:
 
-            # log output in server-side console
-            if len(responseObject['response']) > 0:
+            # log output in server-side console, listings
+            # and batch results are not echoed
+            if type(responseObject['response']) is str and len(responseObject['response']) > 0:
                 self.Core.log(responseObject['response'], 'y')
             if len(responseObject['errors']) > 0:
                 self.Core.log(responseObject['errors'][0], 'red')
 
-            # send the response object
-            self.end_headers()
-            self.wfile.write(json.dumps(responseObject).encode('utf-8'))
+            if deferred and not responseObject['errors']:
+                self._detach(deferred)
+            else:
+                self._sendResponse(status, responseObject, body, etag)
 
     def do_GET (self):
 
         '''
         Casts a web interface to communicate more easily with api.
+        Job output can be streamed as server-sent events from
+        /jobs/<id or name>/logs?follow=1 and job events from
+        /changes?since=<revision>
         '''
+
+        url = urlsplit(self.path)
+        if url.path == '/changes':
+            since = parse_qs(url.query).get('since', ['0'])[0]
+            self._detach(lambda: self._streamChanges(int(since) if since.isdigit() else 0))
+            return
+        match = re.fullmatch(r'/jobs/([^/]+)/logs', url.path)
+        if match:
+            follow = parse_qs(url.query).get('follow', ['0'])[0] in ('1', 'true')
+            self._detach(lambda: self._streamLogs(match.group(1), follow))
+            return
         
-        # communicate header
-        self.send_response(200)
-        self.end_headers()
         self.path = '/client/'
         filename = __root__ + self.path + 'index.html'
         with open(filename, 'rb') as fh:
             html = fh.read()
             #html = bytes(html, 'utf8')
-            self.wfile.write(html)
+        # communicate header
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(html)))
+        self.end_headers()
+        self.wfile.write(html)
         #return http.server.SimpleHTTPRequestHandler.do_GET(self)
-        #self.send_response(__root__ + '/client/index.html')
\ No newline at end of file
+        #self.send_response(__root__ + '/client/index.html')
+
+    def finish (self):
+
+        # a parked keep-alive connection and a detached
+        # request keep their connection open
+        if self.detached or (not self.close_connection and getattr(self.server, 'parking', False)):
+            return
+        http.server.BaseHTTPRequestHandler.finish(self)
+
+    def handle (self):
+
+        '''
+        Serves the first request of the connection. The pooled server parks
+        the connection afterwards and calls serveNext for every further
+        request, other servers serve all requests of the connection here.
+        '''
+
+        self.serveNext()
+        if not getattr(self.server, 'parking', False):
+            while not self.close_connection:
+                self.serveNext()
+
+    def serveNext (self):
+
+        '''
+        Serves a single request of the connection.
+        '''
+
+        self.close_connection = True
+        self.detached = None
+        self.handle_one_request()
+
+    def _batchErrors (self, results, responseObject):
+
+        '''
+        Adds a summary error if items of a batch failed.
+        '''
+
+        failed = sum(1 for result in results if not result['success'])
+        if failed:
+            responseObject['errors'].append(f"{failed} of {len(results)} batch items failed.")
+
+    def _detach (self, function):
+
+        '''
+        Hands a stream or long-poll to the server, which runs it on its own
+        thread outside the worker pool (servers without this support run it
+        right away). Answers 503 if the server runs too many streams already.
+        '''
+
+        detach = getattr(self.server, 'detach', None)
+        if detach is None:
+            function()
+        elif not detach(self, function):
+            self._sendEmpty(503)
+
+    def _sendEmpty (self, status):
+
+        '''
+        Sends a response without body.
+        '''
+
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _sendResponse (self, status, responseObject, body=None, etag=None):
+
+        '''
+        Sends the response object, or the pre-serialized body if provided.
+        An unchanged listing (304) is answered without body.
+        '''
+
+        if status == 304:
+            body = ''
+        elif body is None or responseObject['errors']:
+            body = json.dumps(responseObject, default=str)
+        body = body.encode('utf-8')
+        self.send_response(status)
+        if etag:
+            self.send_header('ETag', etag)
+        if body:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _sendEvent (self, event, data):
+
+        '''
+        Writes a server-sent event, every line of the data becomes a data field.
+        '''
+
+        lines = data.decode('utf-8', 'replace').removesuffix('\n').split('\n')
+        payload = f'event: {event}\n' + ''.join(f'data: {line}\n' for line in lines) + '\n'
+        self.wfile.write(payload.encode('utf-8'))
+        self.wfile.flush()
+
+    def _streamChanges (self, revision):
+
+        '''
+        Streams the job events after the revision as server-sent 'change'
+        events with json data. A 'reset' event tells the client that events
+        were dropped from the bounded log and it should re-list the jobs.
+        '''
+
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+
+        try:
+            changes = self.Core.changesSince(revision)
+            while True:
+                if not changes['complete']:
+                    self._sendEvent('reset', str(changes['revision']).encode('utf-8'))
+                for change in changes['changes']:
+                    self._sendEvent('change', json.dumps(change, default=str).encode('utf-8'))
+                if not changes['changes']:
+                    # comment line, detects disconnected clients
+                    self.wfile.write(b': keepalive\n\n')
+                    self.wfile.flush()
+                revision = changes['revision']
+                changes = self.Core.waitChanges(revision, 15)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _streamLogs (self, identifier, follow):
+
+        '''
+        Streams the buffered output of a job as server-sent events. The
+        subscriber holds its own cursors into the ring buffers of the job,
+        so a slow client only lags behind (and skips overwritten output)
+        but never stalls the job or other subscribers. With follow the
+        stream continues across runs until the client disconnects.
+        '''
+
+        job = self.Core._findJob(identifier)
+        if not job or not hasattr(job.job, 'output_condition'):
+            self._sendEmpty(404)
+            return
+        job = job.job
+        # the stream has no length, it ends with the connection
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        
+        stdout, stderr = None, None
+        cursors = {'stdout': 0, 'stderr': 0}
+        # incomplete last lines are held back until their newline arrives
+        partial = {'stdout': b'', 'stderr': b''}
+        try:
+            while True:
+                # a new run replaces the buffers, start from its beginning
+                if job.stdout is not stdout:
+                    for event in partial:
+                        if partial[event]:
+                            self._sendEvent(event, partial[event])
+                    stdout, stderr = job.stdout, job.stderr
+                    cursors = {'stdout': 0, 'stderr': 0}
+                    partial = {'stdout': b'', 'stderr': b''}
+                for event, buffer in (('stdout', stdout), ('stderr', stderr)):
+                    data, cursors[event] = buffer.read(cursors[event])
+                    data = partial[event] + data
+                    end = data.rfind(b'\n') + 1
+                    if not follow:
+                        end = len(data)
+                    partial[event] = data[end:]
+                    if end:
+                        self._sendEvent(event, data[:end])
+                if not follow:
+                    return
+                with job.output_condition:
+                    ready = job.output_condition.wait_for(lambda: job.stdout is not stdout or stdout.end > cursors['stdout'] or stderr.end > cursors['stderr'], 15)
+                if not ready:
+                    # comment line, detects disconnected clients
+                    self.wfile.write(b': keepalive\n\n')
+                    self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
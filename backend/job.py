@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from os import set_blocking
-from subprocess import Popen, PIPE, STDOUT
+from backend.output import RingBuffer
+from backend.limits import ResourceLimits
+from subprocess import Popen
+from threading import Condition
+import os
+import signal
 from traceback import print_exc
 from time import sleep
 
@@ -12,7 +16,11 @@ class Job:
     API to steer and trace the Job on kernel level.
     '''
 
-    def __init__ (self, requestObject):
+    # stderr markers of failed allocations, an address space
+    # rlimit can't kill a job, it makes its allocations fail
+    allocation_errors = (b'memoryerror', b'cannot allocate memory', b'out of memory', b'bad_alloc')
+
+    def __init__ (self, requestObject, zygote=None, buffer_size=65536, cgroups=None):
 
         # check and apply operating arguments
         self.id = self._checkArgAndAssign('id', str, '', requestObject, mandatory=True)
@@ -20,9 +28,15 @@ class Job:
         #self.active = self._checkArgAndAssign('active', bool, False, requestObject)
         self.arguments = self._checkArgAndAssign('arguments', str, '', requestObject)
         self.command = self._checkArgAndAssign('command', str, '', requestObject)
+        self.execution = self._checkArgAndAssign('execution', str, 'zygote', requestObject)
         #self.repeat = self._checkArgAndAssign('repeat', bool, False, requestObject)
         #self.repeat_sleep = self._checkArgAndAssign('repeat_sleep', int, 1, requestObject)
 
+        # resource limits (ValueError if malformed), applied
+        # through the cgroups if available
+        self.limits = ResourceLimits.fromRequest(requestObject)
+        self.cgroups = cgroups
+
         # try to suggest a command if the corresponding 
         # argument was not provided. If this is not possible
         # a ValueError will be raised.
@@ -32,11 +46,67 @@ class Job:
         # create a start command object which will be passed 
         # directly into the process call
         self.startCommandObject = [self.command, self.target_path, self.arguments]
+
+        # python jobs can be forked from a warm zygote interpreter
+        # instead of a fresh one, unless the popen execution is requested.
+        # Limited jobs are always started with popen to apply their limits.
+        self.zygote = None
+        if zygote and not self.limits and self.execution == 'zygote' and self.command == 'python3' and self.target_path.endswith('.py'):
+            self.zygote = zygote
         
         # process architecture
         # self.process = Process(target=self._workload)
         self.subprocess = None
+        # process group of the run, every run leads its own session
+        # so a stop reaches the children of the job as well
+        self.pgid = None
+        # readable stdout and stderr of the run, drained by the
+        # OutputCapture, and the path prefix of their named pipes
+        self.outputs = None
+        self.fifo = None
+
+        # exit status of the last run, filled by the supervisor
+        self.returncode = None
+        self.time_exited = None
+        self.start_time = None
+
+        # bounded output tails of the last run, both buffers share
+        # one condition so followers can wait for output on either.
+        self.buffer_size = buffer_size
+        self.output_condition = Condition()
+        self.stdout = RingBuffer(buffer_size, self.output_condition)
+        self.stderr = RingBuffer(buffer_size, self.output_condition)
     
+    def attach (self, pid, start_time, fifo=None):
+
+        '''
+        Re-attaches to a still running process of a previous server instance,
+        identified by its pid and start time (to rule out pid reuse).
+        Returns True if the process could be attached. The output of the run
+        is read again from its named pipes (see start), if it has them.
+        The named pipes of a run which is gone are removed.
+        '''
+
+        self.fifo = fifo
+        if start_time is None or AttachedProcess.startTime(pid) != start_time:
+            self.removeFifos()
+            return False
+        self.subprocess = AttachedProcess(pid)
+        self.start_time = start_time
+        # processes of older servers may share the group of the server
+        try:
+            self.pgid = pid if os.getpgid(pid) == pid else None
+        except OSError:
+            self.pgid = None
+        self.outputs = None
+        if fifo and all(os.path.exists(f'{fifo}.{stream}') for stream in ('stdout', 'stderr')):
+            try:
+                self.outputs = tuple(os.fdopen(os.open(f'{fifo}.{stream}', os.O_RDONLY | os.O_NONBLOCK), 'rb', buffering=0)
+                                     for stream in ('stdout', 'stderr'))
+            except OSError:
+                print_exc()
+        return True
+
     def isAlive (self):
 
         '''
@@ -45,67 +115,173 @@ class Job:
         '''
         return self._subprocessIsAlive()
 
+    def limitExceeded (self):
+
+        '''
+        Returns True if the last run ended because it
+        exceeded the memory limit of the job.
+        '''
+
+        if not self.limits or not self.limits.max_memory:
+            return False
+        if self.cgroups and self.cgroups.available:
+            return self.cgroups.oomKilled(self.id)
+        stderr = self.stderr.tail().lower()
+        return any(marker in stderr for marker in self.allocation_errors)
+
     def output (self):
 
         '''
-        A function which redirects the stdout from subprocess.
-        The console output will be joined to a string and returned.
+        Returns the captured tail of stdout and stderr of the last run
+        as strings without blocking. The pipes are drained into the
+        ring buffers by the OutputCapture thread of the core.
         '''
 
-        out = {'stdout': '', 'stderr': ''}
-        if self.subprocess:
-            # print('hit 1')
-            # sleep(3)
-            # stdout = self.subprocess.stdout
-            
-            # for line in self.subprocess.stdout:
-            #     sys.stdout.write(line)
-            #     print(line)
-            # print('stdout', stdout)
-            # stderr = self.subprocess.stderr.readline().rstrip()
-            # print('hit 2')
+        return {
+            'stdout': self.stdout.tail().decode('utf-8', 'replace'),
+            'stderr': self.stderr.tail().decode('utf-8', 'replace')
+        }
+
+    def removeFifos (self):
+
+        '''
+        Removes the named pipes of the run, readers which
+        opened them already keep reading.
+        '''
 
-            # ----- code which extracts the stdout ----
-            stdout = ''
-            stderr = ''
-            # -----------------------------------------
-            
-            out['stdout'] = stdout#.decode('UTF-8')
-            out['stderr'] = stderr#.decode('UTF-8')
-            return out
-        return out
+        if not self.fifo:
+            return
+        for stream in ('stdout', 'stderr'):
+            try:
+                os.remove(f'{self.fifo}.{stream}')
+            except FileNotFoundError:
+                pass
 
-    def start (self):
+    def start (self, fifo=None):
 
         '''
-        Invokes the job.
+        Invokes the job. With fifo (a path prefix), stdout and stderr of the
+        run are the named pipes <fifo>.stdout and <fifo>.stderr instead of
+        anonymous pipes, so a restarted server can open them again and the
+        run never writes into a pipe without reader (see _outputFds).
         '''
 
         if self._subprocessIsAlive():
             print(f'subprocess {self.id} is already alive!')
-        self.subprocess = Popen(self.startCommandObject, stdout=PIPE, stderr=STDOUT)
-        # disable blocking when trying to communicate with subprocess
-        # proposal: https://stackoverflow.com/questions/375427/a-non-blocking-read-on-a-subprocess-pipe-in-python
-        set_blocking(self.subprocess.stdout.fileno(), False)
+        self.returncode = None
+        self.time_exited = None
+        with self.output_condition:
+            self.stdout = RingBuffer(self.buffer_size, self.output_condition)
+            self.stderr = RingBuffer(self.buffer_size, self.output_condition)
+            # wake followers of the previous run
+            self.output_condition.notify_all()
+        self.subprocess = None
+        self.fifo = fifo
+        if self.zygote:
+            try:
+                self.subprocess = self.zygote.spawn(self.target_path, [self.arguments], outputs=self._outputFds())
+                self.outputs = (self.subprocess.stdout, self.subprocess.stderr)
+            except OSError:
+                print_exc()
+        # fall back to a fresh interpreter if the zygote is not available
+        if not self.subprocess:
+            preexec = None
+            if self.limits:
+                procs = self.cgroups.prepare(self.id, self.limits) if self.cgroups else None
+                preexec = self.limits.preexec(procs)
+            (out_read, out_write), (err_read, err_write) = self._outputFds()
+            try:
+                self.subprocess = Popen(self.startCommandObject, stdout=out_write, stderr=err_write,
+                                        start_new_session=True, preexec_fn=preexec)
+            except:
+                os.close(out_read)
+                os.close(err_read)
+                raise
+            finally:
+                os.close(out_write)
+                os.close(err_write)
+            self.outputs = (os.fdopen(out_read, 'rb', buffering=0), os.fdopen(err_read, 'rb', buffering=0))
+        self.pgid = self.subprocess.pid
+        # the start time identifies the process beyond pid reuse
+        self.start_time = AttachedProcess.startTime(self.subprocess.pid)
 
     def stop (self):
 
         '''
-        Stops main- and subprocess immediately.
+        Stops the run without blocking: the process group of the run
+        receives SIGTERM and is detached from the job. Returns the
+        (process, pgid) tuple of the run, which has to be escalated
+        with SIGKILL if it outlives its grace period, or None if no
+        run was alive.
         '''
 
-        # stop the outer loop first to prevent a repeating inner subprocess
-        #self.process.terminate()
+        if not self._subprocessIsAlive():
+            return None
+        run = (self.subprocess, self.pgid)
+        self.subprocess = None
+        self.pgid = None
+        self.signalGroup(*run, signal.SIGTERM)
+        return run
+
+    @staticmethod
+    def groupIsAlive (process, pgid):
+
+        '''
+        Returns True while the process group (or the process,
+        if it has no own group) of a run exists.
+        '''
+
+        if pgid is None:
+            return process.poll() is None
+        try:
+            os.killpg(pgid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    @staticmethod
+    def signalGroup (process, pgid, sig):
+
+        '''
+        Sends a signal to the process group of a run. Falls back to the
+        process itself if it has no own group (yet, a zygote child may
+        not have called setsid so far).
+        '''
 
-        # terminate the subprocess as well
         try:
-            while self._subprocessIsAlive():
-                self.subprocess.kill()
-                sleep(.5)
-        except:
+            if pgid is not None:
+                os.killpg(pgid, sig)
+                return
+        except ProcessLookupError:
+            pass
+        except OSError:
             print_exc()
+        process.send_signal(sig)
         
     # - private methods
+    def _outputFds (self):
+
+        '''
+        Returns the ((read, write), (read, write)) file descriptors of stdout
+        and stderr for a new run, anonymous pipes or the named pipes of the
+        run. The run opens its named pipes for reading and writing, so they
+        always have a reader: while no server reads, the writes of the run
+        block once the pipe is full instead of failing with SIGPIPE.
+        '''
+
+        if not self.fifo:
+            return os.pipe(), os.pipe()
+        fds = []
+        for stream in ('stdout', 'stderr'):
+            path = f'{self.fifo}.{stream}'
+            if not os.path.exists(path):
+                os.mkfifo(path, 0o600)
+            read = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+            fds.append((read, os.open(path, os.O_RDWR)))
+        return tuple(fds)
+
     def _await (self, subprocess):
 
         '''
@@ -130,10 +306,11 @@ class Job:
     def _exceptionOccured (self):
 
         '''
-        Checks if the subprocess indicates errors/exceptions.
+        Checks if the subprocess indicates errors/exceptions
+        by a non-zero exit status or output on stderr.
         '''
 
-        return len(self.output()['stderr']) > 0
+        return bool(self.returncode) or len(self.output()['stderr']) > 0
 
     def _subprocessIsAlive (self):
 
@@ -162,4 +339,67 @@ class Job:
             elif '.go' in self.target_path:
                 self.command = 'go run'
             else:
-                raise ValueError(f'Could not determine a suitable command for this {self.target_path}!')
\ No newline at end of file
+                raise ValueError(f'Could not determine a suitable command for this {self.target_path}!')
+
+class AttachedProcess:
+
+    '''
+    Handle of a process which is not a child of this server (e.g. a job which
+    survived a restart). Mimics the parts of the subprocess.Popen interface
+    used by Job and the Supervisor. The exit status of such a process is
+    unknown, it is reported as None.
+    '''
+
+    def __init__ (self, pid):
+
+        self.pid = pid
+        self.start_time = self.startTime(pid)
+        self.stdout = None
+        self.stderr = None
+        self.returncode = None
+
+    def kill (self):
+
+        self.send_signal(9)
+
+    def poll (self):
+
+        return None if self.startTime(self.pid) == self.start_time else 0
+
+    def send_signal (self, sig):
+
+        if self.poll() is None:
+            try:
+                os.kill(self.pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def terminate (self):
+
+        self.send_signal(15)
+
+    def wait (self, timeout=None):
+
+        waited = 0
+        while self.poll() is None and (timeout is None or waited < timeout):
+            sleep(.1)
+            waited += .1
+        return self.poll()
+
+    @staticmethod
+    def startTime (pid):
+
+        '''
+        Returns the start time (clock ticks after boot) of a process
+        from /proc/<pid>/stat or None if the process does not exist.
+        A zombie counts as not existing.
+        '''
+
+        try:
+            with open(f'/proc/{pid}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+        except (OSError, IndexError):
+            return None
+        if fields[0] == 'Z':
+            return None
+        return int(fields[19])
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import resource
+
+class ResourceLimits:
+
+    '''
+    Resource limits of a job, parsed from the deploy request:
+        max_memory: 268435456 (bytes)
+        cpu_quota: 0.5 (cpus, 0.5 is half of one cpu)
+        nice: 10 (scheduling priority, -20 to 19)
+        cpu_affinity: [0, 1] (cpus the job may run on)
+    Memory and cpu quota are enforced by the cgroup of the run if cgroup v2
+    is available, otherwise the memory becomes an address space rlimit and
+    the cpu quota is not enforced. Nice and affinity are applied in the
+    child between fork and exec.
+    '''
+
+    fields = ('max_memory', 'cpu_quota', 'nice', 'cpu_affinity')
+
+    def __init__ (self, max_memory=None, cpu_quota=None, nice=None, cpu_affinity=None):
+
+        if max_memory is not None and (type(max_memory) is not int or max_memory <= 0):
+            raise ValueError('max_memory must be a positive number of bytes.')
+        if cpu_quota is not None and (type(cpu_quota) not in (int, float) or cpu_quota <= 0):
+            raise ValueError('cpu_quota must be a positive number of cpus e.g. 0.5.')
+        if nice is not None and (type(nice) is not int or not -20 <= nice <= 19):
+            raise ValueError('nice must be an integer between -20 and 19.')
+        if cpu_affinity is not None and (type(cpu_affinity) is not list or not cpu_affinity
+                                         or not all(type(cpu) is int and cpu >= 0 for cpu in cpu_affinity)):
+            raise ValueError('cpu_affinity must be a non-empty list of cpu numbers.')
+        self.max_memory = max_memory
+        self.cpu_quota = cpu_quota
+        self.nice = nice
+        self.cpu_affinity = cpu_affinity
+
+    @classmethod
+    def fromRequest (cls, requestObject):
+
+        '''
+        Returns the limits of a deploy request or None if it sets none.
+        '''
+
+        limits = {field: requestObject[field] for field in cls.fields if requestObject.get(field) is not None}
+        return cls(**limits) if limits else None
+
+    def preexec (self, procs=None):
+
+        '''
+        Returns the function which applies the limits in the child. procs is
+        the cgroup.procs file of the cgroup of the run, the child moves itself
+        there before exec, otherwise the memory limit becomes an rlimit.
+        '''
+
+        def apply ():
+            if procs:
+                with open(procs, 'w') as f:
+                    f.write(str(os.getpid()))
+            elif self.max_memory:
+                resource.setrlimit(resource.RLIMIT_AS, (self.max_memory, self.max_memory))
+            if self.cpu_affinity:
+                os.sched_setaffinity(0, self.cpu_affinity)
+            if self.nice:
+                os.nice(self.nice)
+        return apply
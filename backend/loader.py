@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import hashlib
+import threading
+import importlib.util
+from time import time, monotonic
+from traceback import format_exc
+
+class CustomJobLoader:
+
+    '''
+    Imports the custom job files of a directory in parallel, each file in
+    its own daemon thread with its own timeout, so a hanging import or
+    dependency check can't block the startup. Dependency check results
+    are cached on disk, keyed by file path, mtime and content hash, and
+    expire after cache_ttl seconds (missing dependencies may be installed).
+    The loader remembers mtime and size of the discovered files, changes()
+    reports the files which were added, changed or removed since.
+    '''
+
+    def __init__ (self, directory, cache_path, timeout=10, cache_ttl=86400):
+
+        self.directory = directory
+        self.cache_path = cache_path
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.lock = threading.Lock()
+        # path -> {'mtime', 'hash', 'ok', 'checked'}
+        self.cache = self._loadCache()
+        # path -> (mtime, size) of the last scan
+        self.snapshot = {}
+
+    def changes (self):
+
+        '''
+        Scans the directory and returns the (added, changed, removed) paths
+        since the last scan. The scan only stats the files, their content
+        is read when they are loaded.
+        '''
+
+        previous = self.snapshot
+        self.discover()
+        added = [path for path in self.snapshot if path not in previous]
+        changed = [path for path in self.snapshot if path in previous and self.snapshot[path] != previous[path]]
+        removed = [path for path in previous if path not in self.snapshot]
+        return added, changed, removed
+
+    def discover (self):
+
+        '''
+        Returns the paths of all custom job files and
+        remembers their mtime and size.
+        '''
+
+        snapshot = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith('.py') and 'template' not in entry.name and '__init__' not in entry.name:
+                    stat = entry.stat()
+                    snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        self.snapshot = snapshot
+        return sorted(snapshot)
+
+    def load (self, paths=None):
+
+        '''
+        Imports the files (all discovered files by default) and checks their
+        dependencies. Returns (path, status, job or message) tuples in the
+        order of the paths, the status is 'ok' (the job is returned),
+        'missing' (dependencies not installed) or 'failed' (error or timeout).
+        '''
+
+        if paths is None:
+            paths = self.discover()
+        results = {}
+        threads = []
+        for path in paths:
+            thread = threading.Thread(target=self._loadFile, args=(path, results), daemon=True)
+            thread.start()
+            threads.append((path, thread, monotonic()))
+        out = []
+        for path, thread, started in threads:
+            thread.join(max(0, started + self.timeout - monotonic()))
+            with self.lock:
+                result = results.pop(path, None)
+                if result is None:
+                    # the thread is abandoned, a late result is dropped
+                    results[path] = False
+            if not result:
+                result = ('failed', f'Timed out after {self.timeout}s.')
+            out.append((path,) + result)
+        self._saveCache()
+        return out
+
+    def moduleName (self, path):
+
+        '''
+        Module string in relative python path fashion.
+        '''
+
+        return f"jobs.custom.{os.path.basename(path).replace('.py', '')}"
+
+    # - private methods
+    def _checkDependencies (self, path, job, mtime, digest):
+
+        '''
+        Returns the cached dependency check result if the file did not
+        change and the result did not expire, otherwise runs the check.
+        '''
+
+        with self.lock:
+            entry = self.cache.get(path)
+        if entry and entry['mtime'] == mtime and entry['hash'] == digest and time() - entry['checked'] < self.cache_ttl:
+            return entry['ok']
+        ok = bool(job.dependencyCheck())
+        with self.lock:
+            self.cache[path] = {'mtime': mtime, 'hash': digest, 'ok': ok, 'checked': time()}
+        return ok
+
+    def _loadCache (self):
+
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _loadFile (self, path, results):
+
+        '''
+        Thread target, imports a file, creates the CustomJob
+        and checks its dependencies.
+        '''
+
+        try:
+            with open(path, 'rb') as f:
+                mtime = os.fstat(f.fileno()).st_mtime
+                source = f.read()
+            digest = hashlib.sha1(source).hexdigest()
+            # extract job object from the module, the source which was
+            # hashed is compiled directly (a cached .pyc may be stale
+            # after a quick edit of equal size)
+            spec = importlib.util.spec_from_file_location(self.moduleName(path), path)
+            custom_module = importlib.util.module_from_spec(spec)
+            exec(compile(source, path, 'exec'), custom_module.__dict__)
+            job = custom_module.CustomJob()
+            if self._checkDependencies(path, job, mtime, digest):
+                result = ('ok', job)
+            else:
+                result = ('missing', 'No dependencies installed.')
+        except:
+            result = ('failed', format_exc())
+        with self.lock:
+            if path not in results:
+                results[path] = result
+
+    def _saveCache (self):
+
+        '''
+        Writes the cache atomically, entries of removed files are dropped.
+        '''
+
+        with self.lock:
+            cache = {path: entry for path, entry in self.cache.items() if os.path.exists(path)}
+        try:
+            with open(self.cache_path + '.tmp', 'w') as f:
+                json.dump(cache, f)
+            os.replace(self.cache_path + '.tmp', self.cache_path)
+        except OSError:
+            pass
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+from time import time
+
+class RunLog:
+
+    '''
+    Buffered writer for the output of a single job run.
+    The log lives in <directory>/<job id>/<run>.log and is rotated to
+    <run>.log.1, <run>.log.2, .. once it exceeds max_bytes, keeping at most
+    backup_count rotated files. The writer is shared by the stdout and stderr
+    stream of the run and closes the file once all streams are closed.
+    The writer (OutputCapture) flushes the log at most every flush_interval
+    seconds, also if the job went quiet in between.
+    '''
+
+    def __init__ (self, path, max_bytes=10485760, backup_count=3, streams=2, flush_interval=1):
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.streams = streams
+        self.flush_interval = flush_interval
+        self.last_flush = time()
+        self.file = open(path, 'ab')
+        self.size = self.file.tell()
+
+    def close (self):
+
+        '''
+        Closes one stream, the file is closed with the last stream.
+        '''
+
+        self.streams -= 1
+        if self.streams <= 0 and not self.file.closed:
+            self.file.close()
+
+    def flush (self):
+
+        if not self.file.closed:
+            self.file.flush()
+        self.last_flush = time()
+
+    def flushDue (self):
+
+        '''
+        Time (epoch seconds) at which buffered output should be flushed
+        so tails of running jobs are readable.
+        '''
+
+        return self.last_flush + self.flush_interval
+
+    def write (self, data):
+
+        if self.file.closed:
+            return
+        if self.size + len(data) > self.max_bytes and self.size > 0:
+            self._rotate()
+        self.file.write(data)
+        self.size += len(data)
+
+    # - private methods
+    def _rotate (self):
+
+        '''
+        Shifts <run>.log.i to <run>.log.i+1 and starts a fresh file.
+        '''
+
+        self.file.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(f'{self.path}.{i}'):
+                os.replace(f'{self.path}.{i}', f'{self.path}.{i+1}')
+        if self.backup_count > 0:
+            os.replace(self.path, f'{self.path}.1')
+        else:
+            os.remove(self.path)
+        self.file = open(self.path, 'ab')
+        self.size = 0
+
+def listRuns (directory):
+
+    '''
+    Returns the run names (oldest first) of a job log directory.
+    '''
+
+    if not os.path.isdir(directory):
+        return []
+    return sorted(f[:-4] for f in os.listdir(directory) if f.endswith('.log'))
+
+def pruneRuns (directory, max_runs):
+
+    '''
+    Removes the oldest runs (including rotated files and named pipes) of a job
+    log directory so that at most max_runs runs remain.
+    '''
+
+    runs = listRuns(directory)
+    obsolete = set(runs[:max(0, len(runs) - max_runs)])
+    if not obsolete:
+        return
+    for f in os.listdir(directory):
+        # run names have no dots, the files of a run share its name
+        if f.split('.', 1)[0] in obsolete:
+            os.remove(os.path.join(directory, f))
+
+def tailLines (path, lines=100, block_size=8192):
+
+    '''
+    Returns the last lines of a file by reading blocks backwards from
+    the end, so the cost depends on the number of lines, not the file size.
+    '''
+
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        # one more newline than requested is needed to
+        # know that the first returned line is complete
+        while position > 0 and data.count(b'\n') <= lines:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    out = data.decode('utf-8', 'replace').splitlines()
+    return out[-lines:] if lines > 0 else []
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import selectors
+import threading
+from time import time
+from traceback import print_exc
+
+class RingBuffer:
+
+    '''
+    Fixed-size byte ring buffer which keeps the tail of a stream.
+    Positions are absolute stream offsets, so readers can hold a cursor
+    and continue where they stopped as long as the data was not overwritten.
+    Readers never block the writer, a reader which falls behind by more
+    than the capacity simply skips the overwritten data.
+    '''
+
+    def __init__ (self, capacity=65536, condition=None):
+
+        self.capacity = capacity
+        # allocated with the first write, jobs which never
+        # ran (or never printed) don't hold the capacity
+        self.buffer = None
+        # total number of bytes ever written
+        self.end = 0
+        # the condition can be shared by several buffers (e.g. stdout
+        # and stderr of a job) to wait for data on any of them.
+        self.lock = condition or threading.Condition()
+
+    def read (self, cursor=0):
+
+        '''
+        Returns (data, cursor) with all retained bytes from the cursor
+        on and the cursor to continue from.
+        '''
+
+        with self.lock:
+            start = max(cursor, self.end - self.capacity)
+            if start >= self.end:
+                return b'', self.end
+            first = start % self.capacity
+            last = self.end % self.capacity
+            if first < last:
+                data = bytes(self.buffer[first:last])
+            else:
+                data = bytes(self.buffer[first:]) + bytes(self.buffer[:last])
+            return data, self.end
+
+    def wait (self, cursor, timeout=None):
+
+        '''
+        Blocks until data beyond the cursor is available or the timeout
+        expires. Returns True if new data is available.
+        '''
+
+        with self.lock:
+            return self.lock.wait_for(lambda: self.end > cursor, timeout)
+
+    def tail (self):
+
+        '''
+        Returns all retained bytes.
+        '''
+
+        return self.read()[0]
+
+    def write (self, data):
+
+        with self.lock:
+            if self.buffer is None:
+                self.buffer = bytearray(self.capacity)
+            size = len(data)
+            if size > self.capacity:
+                data = data[-self.capacity:]
+            pos = (self.end + size - len(data)) % self.capacity
+            first = min(len(data), self.capacity - pos)
+            self.buffer[pos:pos + first] = data[:first]
+            self.buffer[:len(data) - first] = data[first:]
+            self.end += size
+            self.lock.notify_all()
+
+class OutputCapture(threading.Thread):
+
+    '''
+    Single I/O thread which drains the stdout/stderr pipes of all jobs
+    as data arrives and writes it into per-job ring buffers, so that
+    chatty jobs never block on a full pipe and memory stays bounded.
+    Run logs with buffered output are flushed once their flush is due,
+    the selector wakes up for it even if no job writes.
+    '''
+
+    def __init__ (self, chunk_size=65536):
+
+        threading.Thread.__init__(self, daemon=True)
+        self.chunk_size = chunk_size
+        self.selector = selectors.DefaultSelector()
+        self.lock = threading.Lock()
+        self.pending = []
+        # run logs with buffered output which is not flushed yet
+        self.unflushed = set()
+        # self-pipe to wake up the selector for new registrations
+        self.wake_read, self.wake_write = os.pipe()
+        os.set_blocking(self.wake_read, False)
+        self.selector.register(self.wake_read, selectors.EVENT_READ)
+
+    def watch (self, stream, buffer, log=None):
+
+        '''
+        Starts draining a readable pipe (file object) into the buffer
+        and optionally into a RunLog. The stream (and the log) is closed
+        by the capture thread on EOF.
+        '''
+
+        with self.lock:
+            self.pending.append((stream, buffer, log))
+        os.write(self.wake_write, b'\0')
+
+    def run (self):
+
+        while True:
+            timeout = None
+            if self.unflushed:
+                timeout = max(0, min(log.flushDue() for log in self.unflushed) - time())
+            for key, _ in self.selector.select(timeout):
+                try:
+                    if key.fd == self.wake_read:
+                        self._register()
+                    else:
+                        self._drain(key)
+                except:
+                    print_exc()
+            if self.unflushed:
+                self._flush()
+
+    # - private methods
+    def _drain (self, key):
+
+        '''
+        Reads the available data of a pipe into its buffer.
+        '''
+
+        stream, buffer, log = key.data
+        try:
+            data = os.read(key.fd, self.chunk_size)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if data:
+            buffer.write(data)
+            if log:
+                log.write(data)
+                self.unflushed.add(log)
+        else:
+            self.selector.unregister(key.fd)
+            stream.close()
+            if log:
+                log.close()
+                if log.file.closed:
+                    self.unflushed.discard(log)
+
+    def _flush (self):
+
+        '''
+        Flushes the run logs whose flush is due.
+        '''
+
+        now = time()
+        for log in [log for log in self.unflushed if log.flushDue() <= now]:
+            try:
+                log.flush()
+            except OSError:
+                print_exc()
+            self.unflushed.discard(log)
+
+    def _register (self):
+
+        '''
+        Drains the wake pipe and registers all pending streams.
+        '''
+
+        try:
+            while os.read(self.wake_read, 512):
+                pass
+        except BlockingIOError:
+            pass
+        with self.lock:
+            pending, self.pending = self.pending, []
+        for stream, buffer, log in pending:
+            os.set_blocking(stream.fileno(), False)
+            self.selector.register(stream.fileno(), selectors.EVENT_READ, (stream, buffer, log))
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import random
+from time import time
+
+class PressureGate:
+
+    '''
+    Admission gate which holds the starts of low-priority jobs while the host
+    is under pressure. The pressure is read from /proc/pressure (PSI, the
+    'some' share of the last 10 seconds in percent) or, without PSI, from
+    the load average per cpu, and from MemAvailable in /proc/meminfo; the
+    readings are refreshed at most every interval seconds. Jobs with a
+    priority of at least bypass_priority always pass. Once the pressure
+    drops, the held starts are released one by one, release_rate starts
+    per second with a random delay of up to jitter seconds each, so jobs
+    which queued up together don't start together.
+    '''
+
+    def __init__ (self, cpu_pressure=80, memory_pressure=20, load_per_cpu=4, min_available=0.05,
+                  bypass_priority=1, release_rate=2, jitter=1, interval=1):
+
+        self.cpu_pressure = cpu_pressure
+        self.memory_pressure = memory_pressure
+        self.load_per_cpu = load_per_cpu
+        # fraction of the total memory
+        self.min_available = min_available
+        self.bypass_priority = bypass_priority
+        self.release_rate = release_rate
+        self.jitter = jitter
+        self.interval = interval
+        self.psi = os.path.exists('/proc/pressure/cpu')
+        # reason of the current pressure or None
+        self.pressure = None
+        self.checked = 0
+        # starts are held because of pressure
+        self.holding = False
+        # pressure dropped, held starts are released gradually
+        self.releasing = False
+        self.next_release = 0
+
+    def allow (self, priority):
+
+        '''
+        Returns True if a job with the priority may start now.
+        '''
+
+        if self.bypass_priority is not None and priority >= self.bypass_priority:
+            return True
+        now = time()
+        if now - self.checked >= self.interval:
+            self.pressure = self._measure()
+            self.checked = now
+        if self.pressure:
+            self.holding, self.releasing = True, False
+            return False
+        if self.holding:
+            self.holding, self.releasing = False, True
+            self.next_release = now + random.uniform(0, self.jitter)
+        if self.releasing:
+            if now < self.next_release:
+                return False
+            self.next_release = now + 1 / self.release_rate + random.uniform(0, self.jitter)
+        return True
+
+    def settle (self, held):
+
+        '''
+        Called after an admission round, held tells if a start was held.
+        The release ends once no start is waiting anymore.
+        '''
+
+        if self.releasing and not held:
+            self.releasing = False
+
+    def wakeup (self):
+
+        '''
+        Time (epoch seconds) at which held starts should be retried.
+        '''
+
+        if self.releasing:
+            return self.next_release
+        return self.checked + self.interval
+
+    # - private methods
+    def _measure (self):
+
+        '''
+        Returns the reason of the current pressure or None.
+        '''
+
+        if self.psi:
+            for resource, threshold in (('cpu', self.cpu_pressure), ('memory', self.memory_pressure)):
+                value = self._readPressure(resource) if threshold is not None else None
+                if value is not None and value > threshold:
+                    return f'{resource} pressure {value:.1f}%'
+        elif self.load_per_cpu is not None:
+            load = os.getloadavg()[0] / (os.cpu_count() or 1)
+            if load > self.load_per_cpu:
+                return f'load {load:.2f} per cpu'
+        if self.min_available is not None:
+            available = self._readAvailable()
+            if available is not None and available < self.min_available:
+                return f'{100 * available:.1f}% memory available'
+        return None
+
+    def _readAvailable (self):
+
+        '''
+        Returns MemAvailable as fraction of MemTotal.
+        '''
+
+        values = {}
+        try:
+            with open('/proc/meminfo') as f:
+                for line in f:
+                    key, value = line.split(':', 1)
+                    if key in ('MemTotal', 'MemAvailable'):
+                        values[key] = int(value.split()[0])
+                        if len(values) == 2:
+                            return values['MemAvailable'] / values['MemTotal']
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def _readPressure (self, resource):
+
+        '''
+        Returns the avg10 of the 'some' line of a PSI file.
+        '''
+
+        try:
+            with open(f'/proc/pressure/{resource}') as f:
+                for field in f.readline().split()[1:]:
+                    key, value = field.split('=')
+                    if key == 'avg10':
+                        return float(value)
+        except (OSError, ValueError):
+            pass
+        return None
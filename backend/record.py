@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import re
+
+class JobRecord:
+
+    '''
+    Compact record of a deployed job.
+    The fields are fixed by __slots__, which saves the per-instance dict
+    and rejects unknown fields. Item access (record['name']) is supported
+    for the config request and serialization.
+    '''
+
+    __slots__ = (
+        'active', 'cron', 'definition', 'disabled', 'finished', 'id', 'job', 'last_status', 'name',
+        'next_run', 'operating_time_window', 'operating_week_days', 'operating_window',
+        'pending', 'priority', 'repeat', 'repeat_sleep', 'run_started', 'schedule', 'tags',
+        'target_path', 'time_created', 'time_duration', 'time_started', 'time_stopped', 'timeout'
+    )
+
+    defaults = {
+        'active': False,
+        'cron': None,
+        'definition': None,
+        'disabled': False,
+        'finished': False,
+        'last_status': None,
+        'next_run': None,
+        'operating_time_window': None,
+        'operating_week_days': 'all',
+        'pending': False,
+        'priority': 0,
+        'repeat': False,
+        'repeat_sleep': 0,
+        'run_started': None,
+        'schedule': None,
+        'tags': (),
+        'time_duration': 0,
+        'time_started': None,
+        'time_stopped': None,
+        'timeout': None
+    }
+
+    def __init__ (self, id, name, job, target_path, time_created, operating_window, **fields):
+
+        self.id = id
+        self.name = name
+        self.job = job
+        self.target_path = target_path
+        self.time_created = time_created
+        self.operating_window = operating_window
+        for field, value in self.defaults.items():
+            setattr(self, field, fields.pop(field, value))
+        if fields:
+            raise TypeError(f'Unknown job fields {list(fields)}.')
+
+    def __getitem__ (self, field):
+
+        try:
+            return getattr(self, field)
+        except AttributeError:
+            raise KeyError(field)
+
+    def __setitem__ (self, field, value):
+
+        if field not in self.__slots__:
+            raise KeyError(field)
+        setattr(self, field, value)
+
+class JobTable:
+
+    '''
+    Container of all JobRecords, indexed by id and by name.
+    Both lookups are O(1); the name index also makes unique
+    name suggestions cheap. Iterating yields the job ids like a dict.
+    '''
+
+    def __init__ (self):
+
+        self.ids = {}
+        self.names = {}
+        # base name -> last suggested suffix, so suggestions
+        # do not probe all taken suffixes again
+        self.suffixes = {}
+
+    def __contains__ (self, id):
+
+        return id in self.ids
+
+    def __getitem__ (self, id):
+
+        return self.ids[id]
+
+    def __iter__ (self):
+
+        return iter(self.ids)
+
+    def __len__ (self):
+
+        return len(self.ids)
+
+    def add (self, record):
+
+        '''
+        Adds a record, its name must be unique.
+        '''
+
+        if record.name in self.names:
+            raise ValueError(f"A job named '{record.name}' exists already.")
+        self.ids[record.id] = record
+        self.names[record.name] = record.id
+
+    def byName (self, name):
+
+        '''
+        Returns the record with the name or None.
+        '''
+
+        id = self.names.get(name)
+        return self.ids[id] if id else None
+
+    def get (self, id, default=None):
+
+        return self.ids.get(id, default)
+
+    def items (self):
+
+        return self.ids.items()
+
+    def keys (self):
+
+        return self.ids.keys()
+
+    def remove (self, id):
+
+        '''
+        Removes and returns the record with the id.
+        '''
+
+        record = self.ids.pop(id)
+        del self.names[record.name]
+        return record
+
+    def rename (self, id, name):
+
+        '''
+        Changes the name of a record, the new name must be unique.
+        '''
+
+        record = self.ids[id]
+        if name == record.name:
+            return
+        if name in self.names:
+            raise ValueError(f"A job named '{name}' exists already.")
+        del self.names[record.name]
+        record.name = name
+        self.names[name] = id
+
+    def suggestName (self, name):
+
+        '''
+        Returns the name if it is not taken yet, otherwise the name with
+        the next free numeric suffix: 'process' -> 'process_1', 'process_2', ..
+        'process_4' -> 'process_5', ..
+        '''
+
+        if name not in self.names:
+            return name
+        match = re.fullmatch(r'(.*)_(\d+)', name)
+        if match:
+            base, n = match.group(1), int(match.group(2)) + 1
+        else:
+            base, n = name, 1
+        n = max(n, self.suffixes.get(base, 0))
+        while f'{base}_{n}' in self.names:
+            n += 1
+        self.suffixes[base] = n
+        return f'{base}_{n}'
+
+    def values (self):
+
+        return self.ids.values()
+
+class JobSnapshot:
+
+    '''
+    Immutable view of the job listing at one revision. The writer publishes
+    a new snapshot after its changes, readers only take a reference and
+    never lock. entries maps job id -> (revision, view, json), order holds
+    the ids sorted, removed maps removed ids -> revision of their removal.
+    queue_depth is the number of pending jobs.
+    '''
+
+    __slots__ = ('revision', 'entries', 'order', 'removed', 'removed_floor', 'queue_depth', 'json')
+
+    def __init__ (self, revision=0, entries=None, order=(), removed=None, removed_floor=0, queue_depth=0):
+
+        self.revision = revision
+        self.entries = entries or {}
+        self.order = order
+        self.removed = removed or {}
+        self.removed_floor = removed_floor
+        self.queue_depth = queue_depth
+        self.json = None
+
+    def toJson (self):
+
+        '''
+        Json array of all job views, built once per snapshot.
+        '''
+
+        if self.json is None:
+            self.json = '[' + ','.join(self.entries[id][2] for id in self.order) + ']'
+        return self.json
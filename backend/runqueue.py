@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import heapq
+from time import time
+
+class RunQueue:
+
+    '''
+    Priority run queue with admission control for job starts.
+    Jobs wait in the queue (pending) until a slot is free, both globally
+    (max_concurrent) and for each of their tags (max_concurrent_per_tag).
+    Higher priorities are admitted first, equal priorities in FIFO order.
+    A limit of 0 or None means unlimited.
+    '''
+
+    def __init__ (self, max_concurrent=None, max_concurrent_per_tag=None):
+
+        self.max_concurrent = max_concurrent or 0
+        self.max_concurrent_per_tag = max_concurrent_per_tag or {}
+        self.heap = []
+        self.counter = 0
+        # pending job id -> (enqueue time, tags)
+        self.queued = {}
+        # running job id -> tags
+        self.running = {}
+        self.running_per_tag = {}
+
+    def admit (self, gate=None):
+
+        '''
+        Pops all jobs which can be started now (in priority order)
+        and counts them as running. Returns the admitted ids. The
+        optional gate (see PressureGate) can hold jobs by priority.
+        '''
+
+        admitted, blocked = [], []
+        held = False
+        while self.heap and self._hasGlobalSlot():
+            entry = heapq.heappop(self.heap)
+            id = entry[2]
+            if id not in self.queued:
+                continue
+            tags = self.queued[id][1]
+            if not self._hasTagSlot(tags):
+                blocked.append(entry)
+                continue
+            # the heap is ordered by priority, the gate holds all following jobs too
+            if gate and not gate.allow(-entry[0]):
+                blocked.append(entry)
+                held = True
+                break
+            del self.queued[id]
+            self.running[id] = tags
+            for tag in tags:
+                self.running_per_tag[tag] = self.running_per_tag.get(tag, 0) + 1
+            admitted.append(id)
+        for entry in blocked:
+            heapq.heappush(self.heap, entry)
+        if gate:
+            gate.settle(held)
+        return admitted
+
+    def depth (self):
+
+        '''
+        Number of pending jobs.
+        '''
+
+        return len(self.queued)
+
+    def enqueued (self, id):
+
+        '''
+        Time (epoch seconds) at which a pending job was queued,
+        None if it is not pending.
+        '''
+
+        if id in self.queued:
+            return self.queued[id][0]
+        return None
+
+    def occupy (self, id, tags=()):
+
+        '''
+        Counts a job as running without admission, e.g. for a
+        process which was re-attached after a restart.
+        '''
+
+        if id in self.running:
+            return
+        self.running[id] = tuple(tags)
+        for tag in tags:
+            self.running_per_tag[tag] = self.running_per_tag.get(tag, 0) + 1
+
+    def push (self, id, priority=0, tags=()):
+
+        '''
+        Enqueues a job as pending.
+        '''
+
+        if id in self.queued or id in self.running:
+            return
+        self.counter += 1
+        self.queued[id] = (time(), tuple(tags))
+        heapq.heappush(self.heap, (-priority, self.counter, id))
+
+    def release (self, id):
+
+        '''
+        Frees the slot of a job which stopped, or drops it from the queue
+        if it is still pending (lazy deletion from the heap).
+        '''
+
+        self.queued.pop(id, None)
+        tags = self.running.pop(id, None)
+        if tags:
+            for tag in tags:
+                self.running_per_tag[tag] -= 1
+
+    def wait (self, id):
+
+        '''
+        Seconds a pending job has been waiting, None if it is not pending.
+        '''
+
+        if id in self.queued:
+            return time() - self.queued[id][0]
+        return None
+
+    # - private methods
+    def _hasGlobalSlot (self):
+
+        return not self.max_concurrent or len(self.running) < self.max_concurrent
+
+    def _hasTagSlot (self, tags):
+
+        for tag in tags:
+            limit = self.max_concurrent_per_tag.get(tag)
+            if limit and self.running_per_tag.get(tag, 0) >= limit:
+                return False
+        return True
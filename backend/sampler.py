@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+from array import array
+from time import monotonic
+from traceback import print_exc
+
+class ResourceSeries:
+
+    '''
+    Fixed-size ring of resource samples of one job: CPU% and RSS (bytes) of
+    its process tree and the read/write rates (bytes/s) of the tree. The
+    arrays are allocated with the first sample. read_bytes and write_bytes
+    count the total I/O of all sampled runs.
+    '''
+
+    __slots__ = ('size', 'count', 'cpu', 'rss', 'read', 'write', 'read_bytes', 'write_bytes')
+
+    def __init__ (self, size):
+
+        self.size = size
+        # total number of samples ever added
+        self.count = 0
+        self.cpu = None
+        self.rss = None
+        self.read = None
+        self.write = None
+        self.read_bytes = 0
+        self.write_bytes = 0
+
+    def add (self, cpu, rss, read, write):
+
+        if self.cpu is None:
+            self.cpu = array('f', bytes(4 * self.size))
+            self.rss = array('Q', bytes(8 * self.size))
+            self.read = array('f', bytes(4 * self.size))
+            self.write = array('f', bytes(4 * self.size))
+        i = self.count % self.size
+        self.cpu[i] = cpu
+        self.rss[i] = rss
+        self.read[i] = read
+        self.write[i] = write
+        self.count += 1
+
+    def summary (self):
+
+        '''
+        Returns current, peak and average of all series over the retained
+        samples, or None if there is no sample yet.
+        '''
+
+        if not self.count:
+            return None
+        n = min(self.count, self.size)
+        last = (self.count - 1) % self.size
+        out = {'samples': n, 'read_bytes': self.read_bytes, 'write_bytes': self.write_bytes}
+        for name in ('cpu', 'rss', 'read', 'write'):
+            values = getattr(self, name)[:n]
+            out[name] = {'current': values[last], 'peak': max(values), 'avg': sum(values) / n}
+        return out
+
+class Sampler(threading.Thread):
+
+    '''
+    Samples the CPU, memory and I/O usage of the watched jobs from /proc.
+    Every job run leads its own process group, so one pass reads the stat
+    file of every process once and assigns it to a job by its group (the
+    process tree of a job, including children which re-parented). The io
+    file of a process is only read again if it used CPU since the last
+    pass, a process which did not run can't have done I/O.
+    '''
+
+    def __init__ (self, interval=5, size=120):
+
+        threading.Thread.__init__(self, daemon=True)
+        self.interval = interval
+        self.size = size
+        self.lock = threading.Lock()
+        # job id -> process group id of the running run
+        self.groups = {}
+        # job id -> ResourceSeries
+        self.series = {}
+        # pid -> [job id, start time, cpu ticks, read bytes, write bytes]
+        self.processes = {}
+        # job ids of runs which did not start after the last pass (re-attached
+        # runs), their first pass only takes the counters as baseline
+        self.baseline = set()
+        self.last = monotonic()
+        self.ticks = os.sysconf('SC_CLK_TCK')
+        self.page_size = os.sysconf('SC_PAGE_SIZE')
+        self.stopped = threading.Event()
+
+    def forget (self, id):
+
+        '''
+        Drops the job and its samples.
+        '''
+
+        with self.lock:
+            self.groups.pop(id, None)
+            self.series.pop(id, None)
+
+    def run (self):
+
+        while not self.stopped.wait(self.interval):
+            try:
+                self.sample()
+            except:
+                print_exc()
+
+    def sample (self):
+
+        '''
+        One batched pass over /proc, adds a sample to the series
+        of every watched job.
+        '''
+
+        with self.lock:
+            # the group ids as they appear in /proc/<pid>/stat
+            groups = {str(pgid).encode(): id for id, pgid in self.groups.items()}
+            baseline, self.baseline = self.baseline, set()
+        now = monotonic()
+        elapsed = now - self.last
+        self.last = now
+        # job id -> [cpu ticks, rss pages, read bytes, write bytes] used since the last pass
+        usage = {id: [0, 0, 0, 0] for id in groups.values()}
+        previous, processes = self.processes, {}
+        for name in os.listdir('/proc'):
+            if not name.isdigit():
+                continue
+            stat = self._read(f'/proc/{name}/stat')
+            if stat is None:
+                continue
+            # the fields after the command name, which may contain spaces
+            fields = stat[stat.rfind(b')') + 2:].split(None, 22)
+            id = groups.get(fields[2])
+            if id is None:
+                continue
+            pid, start, ticks = int(name), fields[19], int(fields[11]) + int(fields[12])
+            entry = previous.get(pid)
+            if entry is None or entry[0] != id or entry[1] != start:
+                # a process which started since the last pass counts in full
+                entry = [id, start, ticks, None, None] if id in baseline else [id, start, 0, 0, 0]
+            total = usage[id]
+            total[0] += ticks - entry[2]
+            total[1] += int(fields[21])
+            if ticks != entry[2] or entry[3] is None:
+                io = self._io(name)
+                if io:
+                    if entry[3] is not None:
+                        total[2] += max(0, io[0] - entry[3])
+                        total[3] += max(0, io[1] - entry[4])
+                    entry[3], entry[4] = io
+            entry[2] = ticks
+            processes[pid] = entry
+        self.processes = processes
+        with self.lock:
+            for id, (ticks, rss, read, write) in usage.items():
+                series = self.series.get(id)
+                if series is None or id not in self.groups or id in baseline:
+                    continue
+                series.read_bytes += read
+                series.write_bytes += write
+                series.add(100 * ticks / self.ticks / elapsed, rss * self.page_size, read / elapsed, write / elapsed)
+
+    def stop (self):
+
+        self.stopped.set()
+
+    def summary (self, id):
+
+        '''
+        Returns the resource summary of a job or None.
+        '''
+
+        with self.lock:
+            series = self.series.get(id)
+            return series.summary() if series else None
+
+    def unwatch (self, id):
+
+        '''
+        The run of the job ended, its samples are kept.
+        '''
+
+        with self.lock:
+            self.groups.pop(id, None)
+
+    def watch (self, id, pgid, baseline=False):
+
+        '''
+        Starts sampling the process group of a run of the job. A run which
+        started before the last pass (baseline) is sampled from the next
+        pass on, otherwise all of its usage counts.
+        '''
+
+        with self.lock:
+            self.groups[id] = pgid
+            if baseline:
+                self.baseline.add(id)
+            if id not in self.series:
+                self.series[id] = ResourceSeries(self.size)
+
+    # - private methods
+    def _io (self, pid):
+
+        '''
+        Returns (read_bytes, write_bytes) of a process or None
+        if its io file can't be read.
+        '''
+
+        io = self._read(f'/proc/{pid}/io')
+        if not io:
+            return None
+        values = {}
+        for line in io.splitlines():
+            key, _, value = line.partition(b':')
+            values[key] = value
+        try:
+            return int(values[b'read_bytes']), int(values[b'write_bytes'])
+        except (KeyError, ValueError):
+            return None
+
+    def _read (self, path):
+
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return None
+        try:
+            return os.read(fd, 4096)
+        except OSError:
+            return None
+        finally:
+            os.close(fd)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import heapq
+import threading
+from time import time
+
+class Scheduler:
+
+    '''
+    Deadline heap which drives the manager thread.
+    Every job holds at most one live deadline (epoch seconds). The waiting
+    thread sleeps until the earliest deadline expires or an external event
+    (deploy, enable, disable, ...) is signalled for a job.
+    '''
+
+    def __init__ (self):
+
+        self.condition = threading.Condition()
+        # live deadline per job id, heap entries which do not
+        # match this mapping anymore are stale and skipped.
+        self.deadlines = {}
+        # job ids signalled from outside (ordered set)
+        self.events = {}
+        self.heap = []
+        self.counter = 0
+
+    def cancel (self, id):
+
+        '''
+        Removes the deadline of a job (lazy deletion from the heap).
+        '''
+
+        with self.condition:
+            self.deadlines.pop(id, None)
+
+    def notify (self, id):
+
+        '''
+        Signals an external event for the job and wakes up the manager.
+        '''
+
+        with self.condition:
+            self.events[id] = None
+            self.condition.notify()
+
+    def notifyMany (self, ids):
+
+        '''
+        Signals events for several jobs with a single wakeup.
+        '''
+
+        with self.condition:
+            for id in ids:
+                self.events[id] = None
+            self.condition.notify()
+
+    def schedule (self, id, deadline):
+
+        '''
+        Sets (or replaces) the deadline of a job.
+        '''
+
+        with self.condition:
+            self.deadlines[id] = deadline
+            self.counter += 1
+            heapq.heappush(self.heap, (deadline, self.counter, id))
+            # wake the manager only if the new deadline is the earliest
+            if self.heap[0][1] == self.counter:
+                self.condition.notify()
+            self._compact()
+
+    def wait (self, timeout=None):
+
+        '''
+        Blocks until at least one job is due and returns the due ids.
+        If a timeout is provided, an empty list may be returned.
+        '''
+
+        with self.condition:
+            while True:
+                now = time()
+                due = dict(self.events)
+                self.events.clear()
+                while self.heap and self.heap[0][0] <= now:
+                    deadline, _, id = heapq.heappop(self.heap)
+                    if self.deadlines.get(id) == deadline:
+                        del self.deadlines[id]
+                        due[id] = None
+                if due:
+                    return list(due)
+                # sleep until the next deadline or a notification
+                delay = self.heap[0][0] - now if self.heap else None
+                if timeout is not None:
+                    delay = timeout if delay is None else min(delay, timeout)
+                if not self.condition.wait(delay) and timeout is not None and delay == timeout:
+                    return []
+
+    # - private methods
+    def _compact (self):
+
+        '''
+        Rebuilds the heap once stale entries dominate it.
+        '''
+
+        if len(self.heap) > 2 * len(self.deadlines) + 64:
+            self.heap = [e for e in self.heap if self.deadlines.get(e[2]) == e[0]]
+            heapq.heapify(self.heap)
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import queue
+import selectors
+import threading
+import http.server
+from time import monotonic
+from traceback import print_exc
+
+class PooledHTTPServer(http.server.HTTPServer):
+
+    '''
+    HTTP server which hands every request to a bounded pool of worker
+    threads, so one slow client does not block the other API calls. If all
+    workers are busy and the backlog is full, the accepting thread waits,
+    which pushes back on new clients instead of spawning an unbounded number
+    of threads.
+
+    A worker serves one request at a time, not a connection: between its
+    requests an idle keep-alive connection is parked in a selector and
+    queued again once its next request arrives (idle connections are closed
+    after the timeout of the handler). Streams and long-polls are detached
+    from the pool onto threads of their own, at most stream_limit at once.
+    The handler implements this protocol with its parking, detached and
+    close_connection attributes (see APIHandler).
+    '''
+
+    daemon_threads = True
+    # listen backlog, the default of 5 drops connection bursts
+    request_queue_size = 128
+    # the handlers hand their connections back after each request
+    parking = True
+
+    def __init__ (self, address, handler, workers=32, backlog=128, stream_limit=256):
+
+        http.server.HTTPServer.__init__(self, address, handler)
+        self.requests = queue.Queue(backlog)
+        self.stream_limit = stream_limit
+        self.streams = 0
+        self.lock = threading.Lock()
+        # parked connections: fd -> (handler, parked since)
+        self.parked = {}
+        self.pending = []
+        self.selector = selectors.DefaultSelector()
+        # self-pipe to wake up the selector for new parked connections
+        self.wake_read, self.wake_write = os.pipe()
+        os.set_blocking(self.wake_read, False)
+        self.selector.register(self.wake_read, selectors.EVENT_READ)
+        threading.Thread(target=self._watchParked, daemon=True).start()
+        self.workers = []
+        for _ in range(workers):
+            worker = threading.Thread(target=self._work, daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def detach (self, handler, function):
+
+        '''
+        Runs the rest of a request (a stream or long-poll) on its own thread,
+        the calling worker returns to the pool. Returns False if stream_limit
+        detached requests are running already.
+        '''
+
+        with self.lock:
+            if self.streams >= self.stream_limit:
+                return False
+            self.streams += 1
+        # the worker starts the thread once the handler returned
+        handler.detached = function
+        return True
+
+    def finish_request (self, request, client_address):
+
+        return self.RequestHandlerClass(request, client_address, self)
+
+    def process_request (self, request, client_address):
+
+        self.requests.put((request, client_address, None))
+
+    def server_close (self):
+
+        http.server.HTTPServer.server_close(self)
+        for _ in self.workers:
+            self.requests.put(None)
+        with self.lock:
+            parked, self.parked = self.parked, {}
+        for handler, _ in parked.values():
+            self._close(handler)
+
+    # - private methods
+    def _close (self, handler):
+
+        handler.close_connection = True
+        try:
+            http.server.BaseHTTPRequestHandler.finish(handler)
+        except OSError:
+            pass
+        self.shutdown_request(handler.request)
+
+    def _park (self, handler):
+
+        '''
+        Waits for the next request of a keep-alive connection without
+        holding a worker. A pipelined request which was read already is
+        queued right away.
+        '''
+
+        connection = handler.connection
+        try:
+            connection.setblocking(False)
+            buffered = handler.rfile.peek(1)
+            connection.settimeout(handler.timeout)
+        except OSError:
+            self._close(handler)
+            return
+        if buffered:
+            self.requests.put((handler.request, handler.client_address, handler))
+            return
+        with self.lock:
+            self.pending.append(handler)
+        os.write(self.wake_write, b'\0')
+
+    def _release (self, handler):
+
+        '''
+        Parks or closes the connection after a request.
+        '''
+
+        if handler.close_connection:
+            self._close(handler)
+        else:
+            self._park(handler)
+
+    def _runDetached (self, handler, function):
+
+        try:
+            function()
+        except:
+            print_exc()
+            handler.close_connection = True
+        finally:
+            with self.lock:
+                self.streams -= 1
+        handler.detached = None
+        self._release(handler)
+
+    def _watchParked (self):
+
+        '''
+        Selector loop over the parked connections, queues the connections
+        with a new request and closes the ones idle for too long.
+        '''
+
+        while True:
+            for key, _ in self.selector.select(1):
+                if key.fd == self.wake_read:
+                    self._register()
+                    continue
+                self.selector.unregister(key.fd)
+                with self.lock:
+                    entry = self.parked.pop(key.fd, None)
+                if entry:
+                    self.requests.put((entry[0].request, entry[0].client_address, entry[0]))
+            now = monotonic()
+            with self.lock:
+                idle = [fd for fd, (handler, since) in self.parked.items() if now - since > handler.timeout]
+                idle = [self.parked.pop(fd)[0] for fd in idle]
+            for handler in idle:
+                self.selector.unregister(handler.connection)
+                self._close(handler)
+
+    def _register (self):
+
+        '''
+        Drains the wake pipe and registers all newly parked connections.
+        '''
+
+        try:
+            while os.read(self.wake_read, 512):
+                pass
+        except BlockingIOError:
+            pass
+        with self.lock:
+            pending, self.pending = self.pending, []
+        for handler in pending:
+            fd = handler.connection.fileno()
+            with self.lock:
+                self.parked[fd] = (handler, monotonic())
+            self.selector.register(fd, selectors.EVENT_READ)
+
+    def _work (self):
+
+        '''
+        Worker loop which serves one request at a time, either the first
+        request of a new connection or the next one of a parked connection.
+        '''
+
+        while True:
+            item = self.requests.get()
+            if item is None:
+                return
+            request, client_address, handler = item
+            try:
+                if handler is None:
+                    handler = self.finish_request(request, client_address)
+                else:
+                    handler.serveNext()
+            except:
+                self.handle_error(request, client_address)
+                self.shutdown_request(request)
+                continue
+            if handler.detached:
+                threading.Thread(target=self._runDetached, args=(handler, handler.detached), daemon=True).start()
+            else:
+                self._release(handler)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import sqlite3
+import threading
+from time import time, sleep
+from traceback import print_exc
+
+class Store(threading.Thread):
+
+    '''
+    Durable job registry in SQLite (WAL mode).
+    Every job row holds its definition (the deploy parameters) and its
+    runtime state as JSON. Writers only put the latest row of a job into a
+    pending map, a background thread flushes all pending rows in a single
+    transaction every flush_interval seconds. Thereby state changes in the
+    manager never wait for the disk.
+    '''
+
+    def __init__ (self, path, flush_interval=0.5):
+
+        threading.Thread.__init__(self, daemon=True)
+        self.path = path
+        self.flush_interval = flush_interval
+        self.condition = threading.Condition()
+        # job id -> (definition, state) or None for deletion
+        self.pending = {}
+        # finished runs waiting to be appended
+        self.pending_runs = []
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        # WAL with synchronous=NORMAL is durable up to the last checkpoint
+        # and avoids a fsync per transaction.
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('''CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            definition TEXT NOT NULL,
+            state TEXT NOT NULL,
+            updated REAL NOT NULL
+        )''')
+        self.connection.execute('''CREATE TABLE IF NOT EXISTS runs (
+            run INTEGER PRIMARY KEY,
+            job_id TEXT NOT NULL,
+            start_wall REAL NOT NULL,
+            end_wall REAL NOT NULL,
+            start_monotonic REAL NOT NULL,
+            end_monotonic REAL NOT NULL,
+            exit_code INTEGER,
+            status TEXT NOT NULL,
+            output_bytes INTEGER NOT NULL
+        )''')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS runs_job ON runs (job_id, start_wall)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS runs_start ON runs (start_wall)')
+        self.lock = threading.Lock()
+
+    run_fields = ['run', 'job_id', 'start_wall', 'end_wall', 'start_monotonic', 'end_monotonic', 'exit_code', 'status', 'output_bytes']
+
+    def delete (self, id):
+
+        with self.condition:
+            self.pending[id] = None
+            self.condition.notify()
+
+    def flush (self):
+
+        '''
+        Writes all pending rows in one transaction. On failure the rows are
+        queued again for the next flush, rows put meanwhile are kept.
+        '''
+
+        with self.condition:
+            pending, self.pending = self.pending, {}
+            runs, self.pending_runs = self.pending_runs, []
+        if not pending and not runs:
+            return
+        try:
+            now = time()
+            upserts = [(id, json.dumps(row[0]), json.dumps(row[1]), now) for id, row in pending.items() if row]
+            deletes = [(id,) for id, row in pending.items() if row is None]
+            with self.lock:
+                with self.connection:
+                    self.connection.execute('BEGIN')
+                    self.connection.executemany('''INSERT INTO jobs (id, definition, state, updated) VALUES (?, ?, ?, ?)
+                        ON CONFLICT(id) DO UPDATE SET definition=excluded.definition, state=excluded.state, updated=excluded.updated''', upserts)
+                    self.connection.executemany('DELETE FROM jobs WHERE id = ?', deletes)
+                    self.connection.executemany('''INSERT INTO runs (job_id, start_wall, end_wall, start_monotonic, end_monotonic, exit_code, status, output_bytes)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', runs)
+        except:
+            with self.condition:
+                self.pending = {**pending, **self.pending}
+                self.pending_runs = runs + self.pending_runs
+            raise
+
+    def history (self, job_id=None, since=None, until=None, status=None, cursor=None, limit=100):
+
+        '''
+        Queries finished runs (newest first) filtered by job, start time
+        range (epoch seconds) and status. Pagination is cursor based: the
+        returned cursor is passed to the next call to continue after the
+        last returned run. The aggregates cover all runs matching the filter.
+
+        RETURN
+        {'runs': [..], 'cursor': int or None, 'aggregates': {'count',
+        'duration_p50', 'duration_p95', 'failure_rate'}}
+        '''
+
+        conditions, parameters = [], []
+        for column, operator, value in (('job_id', '=', job_id), ('start_wall', '>=', since), ('start_wall', '<', until), ('status', '=', status)):
+            if value is not None:
+                conditions.append(f'{column} {operator} ?')
+                parameters.append(value)
+        where = ' AND '.join(conditions) or '1'
+        page_where = where + (' AND run < ?' if cursor is not None else '')
+        page_parameters = parameters + ([cursor] if cursor is not None else [])
+
+        with self.lock:
+            rows = self.connection.execute(f'SELECT {", ".join(self.run_fields)} FROM runs WHERE {page_where} ORDER BY run DESC LIMIT ?', page_parameters + [limit]).fetchall()
+            count, failures = self.connection.execute(f"SELECT COUNT(*), COALESCE(SUM(status IN ('failed', 'timed_out', 'memory_exceeded')), 0) FROM runs WHERE {where}", parameters).fetchone()
+            percentiles = {}
+            for name, q in (('duration_p50', .5), ('duration_p95', .95)):
+                percentiles[name] = None
+                if count:
+                    row = self.connection.execute(f'SELECT end_monotonic - start_monotonic AS d FROM runs WHERE {where} ORDER BY d LIMIT 1 OFFSET ?', parameters + [min(count - 1, int(q * count))]).fetchone()
+                    percentiles[name] = row[0]
+
+        runs = [dict(zip(self.run_fields, row)) for row in rows]
+        return {
+            'runs': runs,
+            'cursor': runs[-1]['run'] if len(runs) == limit else None,
+            'aggregates': dict(percentiles, count=count, failure_rate=failures / count if count else None)
+        }
+
+    def load (self):
+
+        '''
+        Returns all stored jobs as (id, definition, state) tuples.
+        '''
+
+        with self.lock:
+            rows = self.connection.execute('SELECT id, definition, state FROM jobs ORDER BY updated').fetchall()
+        return [(id, json.loads(definition), json.loads(state)) for id, definition, state in rows]
+
+    def put (self, id, definition, state):
+
+        '''
+        Queues the latest definition and state of a job for writing.
+        '''
+
+        with self.condition:
+            # a copy, the caller keeps changing its definition
+            self.pending[id] = (dict(definition), state)
+            self.condition.notify()
+
+    def putRun (self, job_id, start_wall, end_wall, start_monotonic, end_monotonic, exit_code, status, output_bytes):
+
+        '''
+        Queues a finished run for appending to the history.
+        '''
+
+        with self.condition:
+            self.pending_runs.append((job_id, start_wall, end_wall, start_monotonic, end_monotonic, exit_code, status, output_bytes))
+            self.condition.notify()
+
+    def run (self):
+
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending or self.pending_runs)
+            try:
+                self.flush()
+            except:
+                print_exc()
+            # batch all writes which arrive within the interval
+            sleep(self.flush_interval)
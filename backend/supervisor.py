@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import selectors
+import threading
+from time import time
+from traceback import print_exc
+
+class Supervisor(threading.Thread):
+
+    '''
+    Process supervisor which learns about exiting children as they happen.
+    Every watched child is represented by a pidfd registered in a selector,
+    the pidfd turns readable once the child exits. Where pidfds are not
+    available (non-Linux, kernel < 5.3) a waiter thread per child is used.
+    The callback receives (id, process, returncode, timestamp).
+    '''
+
+    def __init__ (self, callback):
+
+        threading.Thread.__init__(self, daemon=True)
+        self.callback = callback
+        self.selector = selectors.DefaultSelector()
+        self.lock = threading.Lock()
+        self.pending = []
+        # self-pipe to wake up the selector for new registrations
+        self.wake_read, self.wake_write = os.pipe()
+        os.set_blocking(self.wake_read, False)
+        self.selector.register(self.wake_read, selectors.EVENT_READ)
+        self.pidfd = hasattr(os, 'pidfd_open')
+
+    def watch (self, id, process):
+
+        '''
+        Starts watching a subprocess.Popen-like process object.
+        '''
+
+        if self.pidfd:
+            try:
+                fd = os.pidfd_open(process.pid)
+            except ProcessLookupError:
+                # the child is gone and was reaped already
+                self._exited(id, process)
+                return
+            except OSError:
+                self.pidfd = False
+            else:
+                with self.lock:
+                    self.pending.append((fd, id, process))
+                os.write(self.wake_write, b'\0')
+                return
+        threading.Thread(target=self._wait, args=(id, process), daemon=True).start()
+
+    def run (self):
+
+        while True:
+            for key, _ in self.selector.select():
+                try:
+                    if key.fd == self.wake_read:
+                        self._register()
+                    else:
+                        self.selector.unregister(key.fd)
+                        os.close(key.fd)
+                        self._exited(*key.data)
+                except:
+                    print_exc()
+
+    # - private methods
+    def _exited (self, id, process):
+
+        '''
+        Reaps the child and forwards the exit status.
+        '''
+
+        process.wait()
+        self.callback(id, process, process.returncode, time())
+
+    def _register (self):
+
+        '''
+        Drains the wake pipe and registers all pending pidfds.
+        '''
+
+        try:
+            while os.read(self.wake_read, 512):
+                pass
+        except BlockingIOError:
+            pass
+        with self.lock:
+            pending, self.pending = self.pending, []
+        for fd, id, process in pending:
+            self.selector.register(fd, selectors.EVENT_READ, (id, process))
+
+    def _wait (self, id, process):
+
+        '''
+        Fallback: blocks a dedicated thread until the child exits.
+        '''
+
+        try:
+            self._exited(id, process)
+        except:
+            print_exc()
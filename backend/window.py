@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import weakref
+from bisect import bisect_right
+from datetime import timedelta
+
+class OperatingWindow:
+
+    '''
+    Compiled form of the operating_week_days and operating_time_window
+    job parameters. At deploy time the window is rendered into a minute-of-week
+    bitmap (monday 00:00 = 0), of which only the sorted minutes at which the
+    state flips are kept. The state of a minute is the parity of the flips
+    up to it, so checking the window is a single bisect. Compiled windows
+    are immutable, jobs with the same window share one (see shared).
+
+    FORMAT
+    operating_week_days: ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+    operating_time_window: ['12:50', '13:10'] daily on the provided days,
+                           ['22:00', '06:00'] crosses midnight into the next day,
+                           ['fri 18:00', 'mon 06:00'] spans multiple days,
+                           the week days are ignored for this form.
+    '''
+
+    __slots__ = ('open', 'transitions', '__weakref__')
+
+    week_days = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+    minutes_per_week = 10080
+    # compiled windows by their parameters, as long as a job uses them
+    cache = weakref.WeakValueDictionary()
+
+    def __init__ (self, operating_week_days='all', operating_time_window=None):
+
+        # weekdays as sorted integers (monday = 0)
+        if operating_week_days == 'all' or operating_week_days is None:
+            days = range(7)
+        else:
+            days = sorted({self._parseDay(d) for d in operating_week_days})
+
+        # the bitmap as integer, bit m is minute m of the week
+        bitmap = 0
+        if not operating_time_window:
+            for day in days:
+                bitmap |= self._fill(day * 1440, day * 1440 + 1439)
+        elif len(operating_time_window) != 2:
+            raise ValueError("'operating_time_window' needs a start and an end e.g. '[12:00, 14:30]'")
+        else:
+            start_day, start = self._parseStamp(operating_time_window[0])
+            end_day, end = self._parseStamp(operating_time_window[1])
+            if (start_day is None) != (end_day is None):
+                raise ValueError("'operating_time_window' either needs week days on both ends or none.")
+            if start_day is None:
+                # daily window, end minute inclusive, an end before
+                # the start crosses midnight into the next day
+                for day in days:
+                    first = day * 1440 + start
+                    last = day * 1440 + end
+                    if end < start:
+                        last += 1440
+                    bitmap |= self._fill(first, last)
+            else:
+                first = start_day * 1440 + start
+                last = end_day * 1440 + end
+                if last < first:
+                    last += self.minutes_per_week
+                bitmap |= self._fill(first, last)
+
+        # minutes of the week at which the state differs from the minute
+        # before, the set bits of the bitmap xor the bitmap rotated by one
+        week = (1 << self.minutes_per_week) - 1
+        flips = bitmap ^ (((bitmap << 1) | (bitmap >> (self.minutes_per_week - 1))) & week)
+        transitions = []
+        while flips:
+            lowest = flips & -flips
+            transitions.append(lowest.bit_length() - 1)
+            flips ^= lowest
+        self.transitions = tuple(transitions)
+        # state of the last minute of the week, which precedes monday 00:00
+        self.open = bool(bitmap >> (self.minutes_per_week - 1))
+
+    @classmethod
+    def shared (cls, operating_week_days='all', operating_time_window=None):
+
+        '''
+        Returns the compiled window of the parameters, compiles it
+        only if no job uses the same window yet.
+        '''
+
+        key = (tuple(operating_week_days) if type(operating_week_days) is list else operating_week_days,
+               tuple(operating_time_window) if operating_time_window else None)
+        window = cls.cache.get(key)
+        if window is None:
+            window = cls.cache[key] = cls(operating_week_days, operating_time_window)
+        return window
+
+    def isOpen (self, dt):
+
+        '''
+        Returns True if the provided datetime lies within the window.
+        '''
+
+        minute = dt.weekday() * 1440 + dt.hour * 60 + dt.minute
+        return self.open ^ (bisect_right(self.transitions, minute) % 2 == 1)
+
+    def nextTransition (self, dt):
+
+        '''
+        Returns the next datetime after dt at which the open/closed state
+        of the window flips, or None if the state never changes.
+        '''
+
+        if not self.transitions:
+            return None
+        minute = dt.weekday() * 1440 + dt.hour * 60 + dt.minute
+        i = bisect_right(self.transitions, minute)
+        if i < len(self.transitions):
+            delta = self.transitions[i] - minute
+        else:
+            delta = self.transitions[0] + self.minutes_per_week - minute
+        return dt.replace(second=0, microsecond=0) + timedelta(minutes=delta)
+
+    # - private methods
+    def _fill (self, first, last):
+
+        '''
+        Returns the bits of all minutes between first and last (inclusive),
+        wrapped around the end of the week.
+        '''
+
+        first %= self.minutes_per_week
+        length = min(last + 1 - first, self.minutes_per_week)
+        bits = ((1 << length) - 1) << first
+        # bits beyond the week wrap around to its start
+        return (bits | bits >> self.minutes_per_week) & ((1 << self.minutes_per_week) - 1)
+
+    def _parseDay (self, day):
+
+        '''
+        Converts a week day string e.g. 'monday' or 'mon' to its index.
+        '''
+
+        day = day.lower()[:3]
+        if day not in self.week_days:
+            raise ValueError(f"'{day}' is not a valid week day, choose from {self.week_days}.")
+        return self.week_days.index(day)
+
+    def _parseStamp (self, stamp):
+
+        '''
+        Converts a '[day ]HH:MM' string into an optional week day index
+        and the minute of the day.
+        '''
+
+        day = None
+        if ' ' in stamp.strip():
+            day, stamp = stamp.split()
+            day = self._parseDay(day)
+        if ':' not in stamp:
+            raise ValueError(f"'{stamp}' is not a valid time, use the 'HH:MM' format.")
+        hour, minute = stamp.split(':')
+        hour, minute = int(hour), int(minute)
+        if not (0 <= hour < 24 and 0 <= minute < 60):
+            raise ValueError(f"'{stamp}' is not a valid time, use the 'HH:MM' format.")
+        return day, hour * 60 + minute
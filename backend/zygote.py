@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import signal
+import socket
+import threading
+from subprocess import Popen
+from traceback import print_exc
+
+class ZygoteProcess:
+
+    '''
+    Handle of a job forked by the zygote. Mimics the parts of the
+    subprocess.Popen interface used by Job and the Supervisor.
+    '''
+
+    def __init__ (self, pid, stdout, stderr):
+
+        self.pid = pid
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = None
+        self.exited = threading.Event()
+
+    def kill (self):
+
+        self.send_signal(signal.SIGKILL)
+
+    def poll (self):
+
+        return self.returncode
+
+    def send_signal (self, sig):
+
+        if self.returncode is None:
+            try:
+                os.kill(self.pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def terminate (self):
+
+        self.send_signal(signal.SIGTERM)
+
+    def wait (self, timeout=None):
+
+        self.exited.wait(timeout)
+        return self.returncode
+
+class Zygote:
+
+    '''
+    Warm fork server for python jobs.
+    A dedicated interpreter is started once, pre-imports the configured
+    modules and afterwards forks a child per run, which executes the target
+    script via runpy. This saves the interpreter startup and import cost of
+    every run. The zygote reports the pid of every forked child and its exit
+    status back over a unix socket.
+    '''
+
+    def __init__ (self, preload=()):
+
+        self.preload = list(preload)
+        self.lock = threading.Lock()
+        self.counter = 0
+        # run token -> [Event, ZygoteProcess, read ends of stdout and stderr]
+        self.spawning = {}
+        # pid -> ZygoteProcess
+        self.running = {}
+        self.process = None
+        self.socket = None
+
+    def isAlive (self):
+
+        return self.process is not None and self.process.poll() is None
+
+    def spawn (self, target_path, arguments=(), timeout=5, outputs=None):
+
+        '''
+        Runs the target script in a fresh fork of the zygote.
+        stdout and stderr of the child are separate pipes,
+        like stdout=PIPE, stderr=PIPE for Popen. outputs may provide
+        the ((read, write), (read, write)) file descriptors of the
+        pipes instead, they are closed if the spawn fails.
+        '''
+
+        (out_read, out_write), (err_read, err_write) = outputs or (os.pipe(), os.pipe())
+        if not self.isAlive():
+            for fd in (out_read, out_write, err_read, err_write):
+                os.close(fd)
+            raise OSError('zygote is not running.')
+        with self.lock:
+            self.counter += 1
+            token = self.counter
+            event = threading.Event()
+            self.spawning[token] = [event, None, (out_read, err_read)]
+        try:
+            try:
+                message = json.dumps({'token': token, 'path': target_path, 'args': list(arguments)})
+                socket.send_fds(self.socket, [message.encode('utf-8')], [out_write, err_write])
+            finally:
+                os.close(out_write)
+                os.close(err_write)
+            event.wait(timeout)
+        finally:
+            # the read ends belong to the process once the reply arrived
+            with self.lock:
+                process = self.spawning.pop(token)[1]
+            if process is None:
+                os.close(out_read)
+                os.close(err_read)
+        if process is None:
+            raise OSError('zygote did not respond.')
+        return process
+
+    def start (self):
+
+        '''
+        Launches the zygote interpreter and the thread which
+        receives pid and exit reports.
+        '''
+
+        self.socket, child = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self.process = Popen([sys.executable, __file__, str(child.fileno())] + self.preload, pass_fds=(child.fileno(),))
+        child.close()
+        threading.Thread(target=self._receive, daemon=True).start()
+
+    def stop (self):
+
+        if self.isAlive():
+            self.process.kill()
+            self.process.wait()
+
+    # - private methods
+    def _receive (self):
+
+        '''
+        Reader loop for messages of the zygote.
+        '''
+
+        while True:
+            try:
+                data = self.socket.recv(4096)
+                if not data:
+                    break
+                message = json.loads(data.decode('utf-8'))
+                if 'token' in message:
+                    with self.lock:
+                        entry = self.spawning.get(message['token'])
+                        if entry is None:
+                            continue
+                        out_read, err_read = entry[2]
+                        process = ZygoteProcess(message['pid'], os.fdopen(out_read, 'rb', buffering=0), os.fdopen(err_read, 'rb', buffering=0))
+                        self.running[process.pid] = process
+                        entry[1] = process
+                        entry[0].set()
+                elif 'exit' in message:
+                    with self.lock:
+                        process = self.running.pop(message['exit'], None)
+                    if process:
+                        process.returncode = message['code']
+                        process.exited.set()
+            except:
+                print_exc()
+        # the zygote died, release everyone who waits for an exit
+        with self.lock:
+            running, self.running = self.running, {}
+        for process in running.values():
+            process.returncode = -1
+            process.exited.set()
+
+def _serve (fd, preload):
+
+    '''
+    Main loop of the zygote interpreter.
+    '''
+
+    import runpy
+    import selectors
+    import importlib
+
+    for module in preload:
+        try:
+            importlib.import_module(module)
+        except:
+            print_exc()
+
+    control = socket.socket(fileno=fd)
+    # wake the loop on SIGCHLD to reap the children
+    wake_read, wake_write = os.pipe()
+    os.set_blocking(wake_read, False)
+    os.set_blocking(wake_write, False)
+    signal.signal(signal.SIGCHLD, lambda *args: None)
+    signal.set_wakeup_fd(wake_write)
+    selector = selectors.DefaultSelector()
+    selector.register(control, selectors.EVENT_READ)
+    selector.register(wake_read, selectors.EVENT_READ)
+
+    while True:
+        for key, _ in selector.select():
+            if key.fileobj is control:
+                data, fds, _, _ = socket.recv_fds(control, 4096, 2)
+                if not data:
+                    return
+                request = json.loads(data.decode('utf-8'))
+                pid = os.fork()
+                if pid == 0:
+                    # ----- child -----
+                    # own session, a stop signals the whole process group
+                    os.setsid()
+                    signal.set_wakeup_fd(-1)
+                    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                    control.close()
+                    os.close(wake_read)
+                    os.close(wake_write)
+                    devnull = os.open(os.devnull, os.O_RDONLY)
+                    os.dup2(devnull, 0)
+                    os.dup2(fds[0], 1)
+                    os.dup2(fds[1], 2)
+                    for f in set(fds):
+                        os.close(f)
+                    code = 0
+                    try:
+                        sys.argv = [request['path']] + request['args']
+                        sys.path[0] = os.path.dirname(os.path.abspath(request['path']))
+                        runpy.run_path(request['path'], run_name='__main__')
+                    except SystemExit as e:
+                        if isinstance(e.code, int):
+                            code = e.code
+                        elif e.code is not None:
+                            print(e.code, file=sys.stderr)
+                            code = 1
+                    except BaseException:
+                        print_exc()
+                        code = 1
+                    finally:
+                        sys.stdout.flush()
+                        sys.stderr.flush()
+                        os._exit(code)
+                for f in set(fds):
+                    os.close(f)
+                # the read ends stay with the server, only the pid is reported
+                control.send(json.dumps({'token': request['token'], 'pid': pid}).encode('utf-8'))
+            else:
+                try:
+                    while os.read(wake_read, 512):
+                        pass
+                except BlockingIOError:
+                    pass
+                while True:
+                    try:
+                        pid, status = os.waitpid(-1, os.WNOHANG)
+                    except ChildProcessError:
+                        break
+                    if pid == 0:
+                        break
+                    control.send(json.dumps({'exit': pid, 'code': os.waitstatus_to_exitcode(status)}).encode('utf-8'))
+
+if __name__ == '__main__':
+
+    _serve(int(sys.argv[1]), sys.argv[2:])
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Compares the throughput of deploying and disabling jobs with one request
+per job against the deploy_batch and disable_batch requests. The jobs
+are deployed disabled into a temporary database, so they never start.
+
+Usage
+    python3 benchmarks/batch_deploy.py [jobs]
+e.g.
+    python3 benchmarks/batch_deploy.py 5000
+'''
+
+import os
+import sys
+import json
+import tempfile
+import threading
+import http.client
+from time import perf_counter
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+os.chdir(root)
+
+# keep the server-side console output out of the measurement
+console = sys.stdout
+sys.stdout = sys.stderr = open(os.devnull, 'w')
+
+# run the core on a temporary database and log directory
+directory = tempfile.mkdtemp()
+from backend.core import Core
+loadConfig = Core._loadConfig
+Core._loadConfig = lambda self: dict(loadConfig(self), database=f'{directory}/bench.db', log_directory=f'{directory}/logs', custom_reload_interval=0)
+
+from snowflake import createServer
+
+def post (connection, request):
+
+    connection.request('POST', '/', json.dumps(request), {'Content-Type': 'application/json'})
+    return json.loads(connection.getresponse().read())
+
+def job (prefix, i):
+
+    return {'name': f'{prefix}_{i}', 'target_path': f'{directory}/job.sh', 'command': 'bash', 'disable': True, 'tags': [prefix]}
+
+def report (name, n, seconds):
+
+    print(f'{name:<22} {seconds:7.2f} s\t{n / seconds:9.0f} jobs/s', file=console)
+
+if __name__ == '__main__':
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    with open(f'{directory}/job.sh', 'w') as f:
+        f.write('exit 0\n')
+
+    server = createServer({'host': '127.0.0.1', 'port': 0, 'server_workers': 8})
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    connection = http.client.HTTPConnection('127.0.0.1', server.server_address[1])
+
+    start = perf_counter()
+    for i in range(n):
+        post(connection, dict(job('single', i), request='deploy'))
+    report('deploy (per job)', n, perf_counter() - start)
+
+    start = perf_counter()
+    response = post(connection, {'request': 'deploy_batch', 'jobs': [job('batch', i) for i in range(n)]})
+    report('deploy_batch', n, perf_counter() - start)
+    assert not response['errors'], response['errors']
+
+    start = perf_counter()
+    for i in range(n):
+        post(connection, {'request': 'disable', 'name': f'single_{i}'})
+    report('disable (per job)', n, perf_counter() - start)
+
+    start = perf_counter()
+    response = post(connection, {'request': 'disable_batch', 'tag': 'batch'})
+    report('disable_batch (tag)', n, perf_counter() - start)
+
+    os._exit(0)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Measures requests/second and latency percentiles of the API for the
+'ping' and 'ls' requests under concurrent keep-alive clients.
+
+Usage
+    python3 benchmarks/http_throughput.py [server_mode] [clients] [requests per client] [workers]
+e.g.
+    python3 benchmarks/http_throughput.py pooled 100 50 128
+    python3 benchmarks/http_throughput.py single 100 50
+'''
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import threading
+import http.client
+from time import perf_counter
+from statistics import quantiles
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+os.chdir(root)
+
+# keep the server-side console output out of the measurement
+console = sys.stdout
+sys.stdout = open(os.devnull, 'w')
+
+# run the core on a temporary database and log directory
+directory = tempfile.mkdtemp()
+from backend.core import Core
+loadConfig = Core._loadConfig
+Core._loadConfig = lambda self: dict(loadConfig(self), database=f'{directory}/bench.db', log_directory=f'{directory}/logs',
+                                     custom_reload_interval=0)
+
+from snowflake import createServer
+
+def client (port, request, count, latencies, barrier):
+
+    '''
+    Sends count requests over one persistent connection.
+    '''
+
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    body = json.dumps(request)
+    headers = {'Content-Type': 'application/json'}
+    barrier.wait()
+    for _ in range(count):
+        start = perf_counter()
+        connection.request('POST', '/', body, headers)
+        connection.getresponse().read()
+        latencies.append((perf_counter() - start) * 1000)
+    connection.close()
+
+def run (port, request, clients, count):
+
+    latencies = []
+    barrier = threading.Barrier(clients + 1)
+    threads = [threading.Thread(target=client, args=(port, request, count, latencies, barrier)) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = perf_counter()
+    for t in threads:
+        t.join()
+    duration = perf_counter() - start
+    p = quantiles(latencies, n=100)
+    print(f"{request['request']:<5} {len(latencies) / duration:9.1f} req/s\tp50 {p[49]:7.2f} ms\tp99 {p[98]:7.2f} ms", file=console)
+
+if __name__ == '__main__':
+
+    mode = sys.argv[1] if len(sys.argv) > 1 else 'pooled'
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    count = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    workers = int(sys.argv[4]) if len(sys.argv) > 4 else clients
+
+    server = createServer({'host': '127.0.0.1', 'port': 0, 'server_mode': mode, 'server_workers': workers})
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    print(f'{mode} server, {clients} clients x {count} requests', file=console)
+    run(port, {'request': 'ping'}, clients, count)
+    run(port, {'request': 'ls'}, clients, count)
+    shutil.rmtree(directory, ignore_errors=True)
+    os._exit(0)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Measures the startup cost of the server core and of the cli and fails
+(exit code 1) if one of them exceeds its budget. The cost is the median
+wall time of a fresh interpreter running the target minus the median
+wall time of a bare interpreter, the slowest imports are listed from
+python -X importtime.
+
+Usage
+    python3 benchmarks/import_time.py [runs]
+e.g.
+    python3 benchmarks/import_time.py 20
+'''
+
+import os
+import sys
+from time import perf_counter
+from statistics import median
+from subprocess import run, DEVNULL, PIPE
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# target -> (interpreter arguments, budget in ms)
+targets = {
+    'backend.core': (['-c', 'import backend.core'], 150),
+    'sf --help': ([os.path.join(root, 'cli', 'cli.py'), '--help'], 80)
+}
+
+def wallTime (arguments, runs):
+
+    '''
+    Returns the median wall time (ms) of a fresh interpreter.
+    '''
+
+    times = []
+    for _ in range(runs):
+        start = perf_counter()
+        run([sys.executable] + arguments, cwd=root, stdout=DEVNULL, stderr=DEVNULL, check=True)
+        times.append((perf_counter() - start) * 1000)
+    return median(times)
+
+def slowestImports (arguments, count=5):
+
+    '''
+    Returns (cumulative ms, module) of the slowest top-level imports.
+    '''
+
+    stderr = run([sys.executable, '-X', 'importtime'] + arguments, cwd=root, stdout=DEVNULL, stderr=PIPE, text=True).stderr
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[12:].split('|')
+        # top-level imports are not indented
+        if not module.startswith('  '):
+            imports.append((int(cumulative) / 1000, module.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+if __name__ == '__main__':
+
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    baseline = wallTime(['-c', 'pass'], runs)
+    print(f'interpreter baseline {baseline:.1f} ms')
+    exceeded = False
+    for name, (arguments, budget) in targets.items():
+        cost = wallTime(arguments, runs) - baseline
+        ok = cost <= budget
+        exceeded |= not ok
+        print(f'{name:<14} {cost:7.1f} ms (budget {budget} ms) {"ok" if ok else "EXCEEDED"}')
+        for ms, module in slowestImports(arguments):
+            print(f'\t{ms:7.1f} ms  {module}')
+    sys.exit(1 if exceeded else 0)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Compares the former dict-based job entries (linear name lookups) with
+the JobRecord/JobTable registry: memory per job, lookups by id and name
+and unique name suggestions. The jobs are built like deploy builds them,
+with their Job object, definition, cron schedule and operating window
+(a few distinct windows, which jobs share).
+
+Usage
+    python3 benchmarks/job_table.py [jobs]
+e.g.
+    python3 benchmarks/job_table.py 100000
+'''
+
+import os
+import sys
+import tracemalloc
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime
+from backend.cron import CronSchedule
+from backend.job import Job
+from backend.record import JobRecord, JobTable
+from backend.window import OperatingWindow
+
+windows = [('all', None), (['mon', 'tue', 'wed', 'thu', 'fri'], ['08:00', '18:00']),
+           (['sat', 'sun'], ['22:00', '06:00']), ('all', ['fri 18:00', 'mon 06:00'])]
+
+def request (i):
+
+    '''
+    Returns a deploy request like the clients send it.
+    '''
+
+    days, window = windows[i % len(windows)]
+    return {'id': f'{i:016x}', 'name': f'job_{i}', 'target_path': f'/opt/jobs/job_{i}.py', 'command': 'python3',
+            'arguments': '--verbose', 'schedule': f'{i % 60} * * * *', 'operating_week_days': days,
+            'operating_time_window': window, 'tags': ['benchmark', f'group_{i % 10}'], 'priority': i % 3,
+            'time_created': '01-01-2026 00:00:00'}
+
+def fields (requestObject):
+
+    '''
+    Returns the job object and the fields of a deploy request.
+    '''
+
+    cron = CronSchedule(requestObject['schedule'])
+    return Job(requestObject), dict(
+        active=False, definition=dict(requestObject), disabled=False, finished=False,
+        operating_time_window=requestObject['operating_time_window'],
+        operating_week_days=requestObject['operating_week_days'],
+        cron=cron, next_run=cron.nextFire(datetime.now()).timestamp(), pending=False,
+        priority=requestObject['priority'], repeat=False, repeat_sleep=0, schedule=requestObject['schedule'],
+        tags=requestObject['tags'], run_started=None, time_duration=0, time_started=None, time_stopped=None)
+
+def buildDicts (n):
+
+    jobs = {}
+    for i in range(n):
+        requestObject = request(i)
+        job, values = fields(requestObject)
+        jobs[requestObject['id']] = dict(values, id=requestObject['id'], job=job, name=requestObject['name'],
+                                         target_path=requestObject['target_path'],
+                                         time_created=requestObject['time_created'],
+                                         operating_window=OperatingWindow.shared(*windows[i % len(windows)]))
+    return jobs
+
+def buildTable (n):
+
+    jobs = JobTable()
+    for i in range(n):
+        requestObject = request(i)
+        job, values = fields(requestObject)
+        jobs.add(JobRecord(requestObject['id'], requestObject['name'], job, requestObject['target_path'],
+                           requestObject['time_created'], OperatingWindow.shared(*windows[i % len(windows)]),
+                           **values))
+    return jobs
+
+def allocated (build, n):
+
+    '''
+    Returns the registry and the bytes it allocated.
+    '''
+
+    tracemalloc.start()
+    jobs = build(n)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return jobs, size
+
+def timed (function, repeat):
+
+    start = perf_counter()
+    for _ in range(repeat):
+        function()
+    return (perf_counter() - start) / repeat * 1e6
+
+if __name__ == '__main__':
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    dicts, dict_size = allocated(buildDicts, n)
+    table, table_size = allocated(buildTable, n)
+    print(f'{n} jobs')
+    print(f'memory        dict {dict_size / n:8.0f} B/job\trecord {table_size / n:8.0f} B/job')
+
+    name, id = f'job_{n - 1}', f'{n - 1:016x}'
+    linear = lambda: next(j for j in dicts.values() if j['name'] == name)
+    print(f'id lookup     dict {timed(lambda: dicts[id], 10000):8.3f} us\trecord {timed(lambda: table[id], 10000):8.3f} us')
+    print(f'name lookup   dict {timed(linear, 10):8.1f} us\trecord {timed(lambda: table.byName(name), 10000):8.3f} us')
+    print(f'suggest name  record {timed(lambda: table.suggestName("job_1"), 10000):8.3f} us ({table.suggestName("job_1")})')
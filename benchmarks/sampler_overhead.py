@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Measures the CPU cost of the resource sampler with many running jobs and
+fails (exit code 1) if it exceeds 1% of one core at the sampling interval.
+Every job is a tree of two processes in its own session, like the runs of
+the core. Most jobs wait, every active-th job is a shell loop which forks
+a new child every second.
+
+Usage
+    python3 benchmarks/sampler_overhead.py [jobs] [interval] [passes] [active]
+e.g.
+    python3 benchmarks/sampler_overhead.py 1000 5 10 20
+'''
+
+import os
+import sys
+import signal
+from time import sleep, thread_time, perf_counter
+from subprocess import Popen, DEVNULL
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+from backend.sampler import Sampler
+
+if __name__ == '__main__':
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    interval = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    passes = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    active = int(sys.argv[4]) if len(sys.argv) > 4 else 20
+
+    jobs = []
+    try:
+        for i in range(n):
+            command = 'while sleep 1; do :; done' if i % active == 0 else 'sleep 3600 & wait'
+            jobs.append(Popen(['sh', '-c', command], stdout=DEVNULL, start_new_session=True))
+        sampler = Sampler(interval)
+        for i, job in enumerate(jobs):
+            sampler.watch(str(i), job.pid, baseline=True)
+        # the first pass only takes the baseline
+        sampler.sample()
+        cpu, wall = [], []
+        for _ in range(passes):
+            sleep(1)
+            start_cpu, start_wall = thread_time(), perf_counter()
+            sampler.sample()
+            cpu.append(thread_time() - start_cpu)
+            wall.append(perf_counter() - start_wall)
+        sampled = sum(1 for i in range(n) if sampler.summary(str(i)))
+    finally:
+        for job in jobs:
+            os.killpg(job.pid, signal.SIGKILL)
+        for job in jobs:
+            job.wait()
+
+    per_pass = sum(cpu) / passes
+    overhead = 100 * per_pass / interval
+    print(f'{n} jobs, {sampled} sampled, {os.cpu_count()} cpus')
+    print(f'pass cpu {1000 * per_pass:.1f} ms\twall {1000 * sum(wall) / passes:.1f} ms')
+    print(f'overhead at {interval:g}s interval {overhead:.2f}% of one core {"ok" if overhead < 1 else "EXCEEDED"}')
+    sys.exit(0 if overhead < 1 else 1)
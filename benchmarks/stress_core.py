@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Stress test of the job state: deployer, configurer and toggler threads
+change jobs concurrently while the manager runs repeating jobs and reader
+threads list the jobs and follow the change log. Fails (exit code 1) on
+any exception, a lost deploy, duplicate names, a reader which saw the
+revision go backwards, a follower which missed an event of the change log
+or a final listing which does not match the table. Reports the read
+latencies.
+
+Usage
+    python3 benchmarks/stress_core.py [seconds] [threads per role]
+e.g.
+    python3 benchmarks/stress_core.py 10 4
+'''
+
+import os
+import sys
+import random
+import tempfile
+import threading
+from time import sleep, perf_counter
+from statistics import quantiles
+from traceback import format_exc
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+os.chdir(root)
+
+# keep the server-side console output out of the measurement
+console = sys.stdout
+sys.stdout = open(os.devnull, 'w')
+
+# run the core on a temporary database and log directory
+directory = tempfile.mkdtemp()
+from backend.core import Core
+loadConfig = Core._loadConfig
+Core._loadConfig = lambda self: dict(loadConfig(self), database=f'{directory}/stress.db', log_directory=f'{directory}/logs',
+                                     custom_reload_interval=0, log_max_runs=1, change_log_size=10 ** 7)
+
+errors = []
+stop = threading.Event()
+
+def role (function):
+
+    '''
+    Runs the function until the stop event, exceptions are collected.
+    '''
+
+    def loop (*args):
+        while not stop.is_set():
+            try:
+                function(*args)
+            except:
+                errors.append(format_exc())
+                return
+    return loop
+
+def deployer (core, prefix, deployed):
+
+    name = f'{prefix}_{len(deployed)}'
+    success, info = core.deploy({'name': name, 'target_path': f'{directory}/job.sh', 'command': 'bash', 'repeat': True})
+    if not success:
+        raise RuntimeError(info)
+    deployed.append(name)
+
+def configurer (core):
+
+    ids = list(core.jobs.keys())
+    if ids:
+        core.configure(random.choice(ids), 'priority', random.randint(0, 9))
+
+def toggler (core):
+
+    ids = list(core.jobs.keys())
+    if ids:
+        id = random.choice(ids)
+        core.disable(id) if random.random() < .5 else core.enable(id)
+        sleep(.001)
+
+def reader (core, latencies):
+
+    last = -1
+    while not stop.is_set():
+        start = perf_counter()
+        listing = core.listJobs(fields=['id', 'name', 'active'])
+        core.listJson()
+        core.changesSince(max(0, last - 100))
+        latencies.append((perf_counter() - start) * 1000)
+        if listing['revision'] < last:
+            raise RuntimeError(f"revision went backwards {last} -> {listing['revision']}")
+        if len({job['id'] for job in listing['jobs']}) != len(listing['jobs']):
+            raise RuntimeError('duplicate ids in a listing')
+        last = listing['revision']
+
+def follower (core, followed):
+
+    '''
+    Follows the change log like an SSE client, collecting the revisions.
+    '''
+
+    revision = followed[-1] if followed else 0
+    changes = core.waitChanges(revision, .1)
+    if not changes['complete']:
+        raise RuntimeError(f'change log dropped events after {revision}')
+    followed.extend(change['revision'] for change in changes['changes'])
+    if changes['changes'] and changes['revision'] != followed[-1]:
+        raise RuntimeError(f"cursor {changes['revision']} is not the last event {followed[-1]}")
+
+if __name__ == '__main__':
+
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    with open(f'{directory}/job.sh', 'w') as f:
+        f.write('exit 0\n')
+
+    core = Core()
+    deployed = [[] for _ in range(count)]
+    latencies = [[] for _ in range(count)]
+    followed = []
+    threads = [threading.Thread(target=role(follower), args=(core, followed))]
+    for i in range(count):
+        threads.append(threading.Thread(target=role(deployer), args=(core, f'job{i}', deployed[i])))
+        threads.append(threading.Thread(target=role(configurer), args=(core,)))
+        threads.append(threading.Thread(target=role(toggler), args=(core,)))
+        threads.append(threading.Thread(target=role(reader), args=(core, latencies[i])))
+    for t in threads:
+        t.start()
+    sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    # let the manager finish its round, then compare the final listing
+    sleep(1)
+    with core.lock:
+        core._publish()
+        table = {id: job.name for id, job in core.jobs.items()}
+    listing = {job['id']: job['name'] for job in core.listJobs(fields=['id', 'name'])['jobs']}
+
+    names = [name for names in deployed for name in names]
+    if len(table) != len(names) or set(table.values()) != set(names):
+        errors.append(f'{len(names)} deploys but {len(table)} jobs in the table')
+    if listing != table:
+        errors.append('final listing does not match the job table')
+    # the manager keeps logging after the follower left, compare up to its cursor
+    with core.changed:
+        logged = [change['revision'] for change in core.changes if followed and change['revision'] <= followed[-1]]
+    if followed != logged:
+        errors.append(f'follower saw {len(followed)} of {len(logged)} events')
+
+    latencies = [l for ls in latencies for l in ls]
+    print(f'{len(names)} deploys, {len(latencies)} reads, {len(followed)} events followed, revision {core.revision}', file=console)
+    if len(latencies) > 1:
+        p = quantiles(latencies, n=100)
+        print(f'read latency p50 {p[49]:.2f} ms\tp99 {p[98]:.2f} ms\tmax {max(latencies):.2f} ms', file=console)
+    for error in errors[:3]:
+        print(error, file=console)
+    print('FAILED' if errors else 'ok', file=console)
+    os._exit(1 if errors else 0)
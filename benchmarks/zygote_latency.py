@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Compares the spawn-to-first-line latency of python jobs started
+with a plain Popen (fresh interpreter) and forked from the zygote.
+
+Usage
+    python3 benchmarks/zygote_latency.py [runs] [preload modules ...]
+e.g.
+    python3 benchmarks/zygote_latency.py 50 json http.server
+'''
+
+import os
+import sys
+import tempfile
+from time import perf_counter
+from statistics import median, quantiles
+from subprocess import Popen, PIPE, STDOUT
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.zygote import Zygote
+
+def measure (spawn, runs):
+
+    '''
+    Returns a list of latencies (ms) until the first output line arrives.
+    '''
+
+    latencies = []
+    for _ in range(runs):
+        start = perf_counter()
+        process = spawn()
+        process.stdout.readline()
+        latencies.append((perf_counter() - start) * 1000)
+        process.wait()
+    return latencies
+
+def report (name, latencies):
+
+    p95 = quantiles(latencies, n=20)[-1]
+    print(f'{name:<8} median {median(latencies):8.2f} ms\tp95 {p95:8.2f} ms')
+
+if __name__ == '__main__':
+
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    preload = sys.argv[2:]
+
+    # the job imports the preloaded modules like a real job would
+    with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False) as f:
+        f.write(''.join(f'import {m}\n' for m in preload) + 'print("ready", flush=True)\n')
+        script = f.name
+
+    zygote = Zygote(preload)
+    zygote.start()
+    try:
+        report('popen', measure(lambda: Popen(['python3', script], stdout=PIPE, stderr=STDOUT), runs))
+        report('zygote', measure(lambda: zygote.spawn(script), runs))
+    finally:
+        zygote.stop()
+        os.remove(script)
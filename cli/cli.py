@@ -21,9 +21,13 @@ __commands__ = [
     ('deploy', 'Deploy program or package remotely. Demands other optional arguments: --name, --target_path, etc.'), 
     ('config', 'Configure a job. Demands optional arguments: --id or --name (identifier), --arg tuple.'), 
     ('ls', 'Outputs status monitor for all jobs. Demands no arguments.'), 
+    ('logs', 'Prints the last lines of a job log. Demands optional arguments: --id or --name (identifier), --lines, --run, -f to follow.'),
+    ('next_runs', 'Lists upcoming executions of scheduled jobs. Demands optional arguments: --id or --name (identifier), --count.'), 
     ('enable', 'Enables a (apriori deployed) job. Demands optional arguments: --id or --name (identifier).'), 
     ('disable', 'Disables a deployed job. Demands optional arguments: --id or --name (identifier).'),
-    ('halt', 'Disables all services immediately. Demands no arguments.')
+    ('remove', 'Stops and removes a deployed job. Demands optional arguments: --id or --name (identifier).'),
+    ('halt', 'Disables all services immediately. Demands no arguments.'),
+    ('stats', 'Outputs CPU, memory and I/O usage of all jobs or a single job. Demands optional arguments: --id or --name (identifier).')
 ]
 
 # ______________ Define Optional Arguments ______________
@@ -37,24 +41,39 @@ __optional__ = {
     'weekdays': ('--weekdays', 'Limit the job service to specific weekdays, provide a string of days sep. by a "," e.g.\nmon,tue,wed,saturday. The service will only be active on the provided days.', str), 
     'daytime': ('--daytime', 'Limit the job service to specific time window during the day. Provide a string of accending times in 0-23 hour format sep. by a "," e.g.\n12:00,12:30. The service will only be active during the provided window.', str), 
     'repeat': ('--repeat', 'Whether the job should repeat once it has finished.', bool),
+    'schedule': ('--schedule', 'Start the job according to a 5-field cron expression e.g. "*/5 * * * *".', str),
+    'count': ('--count', 'Number of entries to return.', int),
+    'lines': ('--lines', 'Number of log lines to return (default 100).', int),
+    'run': ('--run', 'Select a previous run by its name, the latest run is used by default.', str),
+    'priority': ('--priority', 'Start priority of the job when slots are limited, higher starts first.', int),
+    'tags': ('--tags', 'Tags for concurrency limits, provide a string of tags sep. by a "," e.g. nightly,backup.', str),
+    'timeout': ('--timeout', 'Maximum runtime of a run in seconds, longer runs are stopped and recorded as timed out.', float),
+    'max_memory': ('--max_memory', 'Memory limit of the job in bytes.', int),
+    'cpu_quota': ('--cpu_quota', 'CPU limit of the job in cpus e.g. 0.5 (needs cgroup v2).', float),
+    'nice': ('--nice', 'Scheduling priority of the job from -20 to 19.', int),
+    'cpu_affinity': ('--cpu_affinity', 'CPUs the job may run on, provide a string of cpu numbers sep. by a "," e.g. 0,1.', str),
 }
 
 __command_args__ = {
     'set': ['host', 'port'],
     'ping': [],
     'config': ['arg'],
-    'deploy': ['target_path', 'weekdays', 'daytime', 'repeat'],
+    'deploy': ['name', 'target_path', 'weekdays', 'daytime', 'repeat', 'schedule', 'priority', 'tags', 'timeout',
+               'max_memory', 'cpu_quota', 'nice', 'cpu_affinity'],
     'ls': ['id', 'name'],
+    'logs': ['id', 'name', 'lines', 'run'],
+    'next_runs': ['id', 'name', 'count'],
     'enable': ['id', 'name'],
     'disable': ['id', 'name'],
-    'halt': []
+    'remove': ['id', 'name'],
+    'halt': [],
+    'stats': ['id', 'name']
 }
 
 import sys
 import argparse
 import json
 from traceback import format_exc
-import requests
 import pathlib
 
 __alias__ = 'sf'
@@ -89,16 +108,46 @@ def post (url, options):
 
     '''
     Simple socket post method.
+    Returns the response content, errors are logged and yield None.
     '''
 
+    # requests is imported on first use, it dominates the startup
+    # time of the cli and commands like --help never need it.
+    import requests
+
     try:
         response = requests.post(url, json=json.dumps(options))
         response.encoding = response.apparent_encoding
         response = json.loads(response.text)
         if len(response['errors']) > 0:
             log(response['errors'][0], 'red')
-        else:
-            log(response['response'][0])
+            return None
+        return response['response']
+    except:
+        log(format_exc(), 'red')
+
+def follow (url, identifier):
+
+    '''
+    Follows the output of a job via the server-sent event stream
+    and prints it until interrupted.
+    '''
+
+    import requests
+
+    try:
+        with requests.get(f'{url}/jobs/{identifier}/logs?follow=1', stream=True) as response:
+            if response.status_code != 200:
+                log(f"Identifier '{identifier}' not found.", 'red')
+                return
+            event = 'stdout'
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith('event: '):
+                    event = line[7:]
+                elif line.startswith('data: '):
+                    log(line[6:], 'red' if event == 'stderr' else '')
+    except KeyboardInterrupt:
+        pass
     except:
         log(format_exc(), 'red')
 
@@ -115,7 +164,7 @@ if __name__ == '__main__':
         #command_group.add_argument(option[0], help=option[1])
     
     # add command arguments
-    subparsers = parser.add_subparsers(help='Required CLI command option.')
+    subparsers = parser.add_subparsers(dest='command', help='Required CLI command option.')
     subparsers_dict = {}
     #command_group = parser.add_argument_group('Command', 'Required CLI command option.')
     for option in __commands__:
@@ -125,9 +174,7 @@ if __name__ == '__main__':
         for arg in __command_args__[command]:
             info = __optional__[arg]
             subparser.add_argument(info[0], help=info[1], type=info[2])
-
-    # add optional arguments
-    print('hit')
+    subparsers_dict['logs'].add_argument('-f', '--follow', action='store_true', help='Follow the job output as it arrives.')
 
     # add optional arguments
     # add command arguments
@@ -180,20 +227,10 @@ if __name__ == '__main__':
             log(f'Cannot reach server under {url}', 'red')
             quit() 
 
-    # parse the raw input command word by word
-    rawInputWords = []
-    # check if any argument was provided
-    if len(sys.argv) > 1:
-        print('args', args)
-        for word in args.text.split(' '):
-            if word != '':
-                rawInputWords.append(word)
-
-    # next parse the command from the raw input 
-    # which is crucial to continue
-    command = rawInputWords[1]
-    if command not in __commands__:
-        log(f"'{command}' is not a valid command. See valid commands with '{__alias__} --help'.", 'red')
+    # the command is parsed by the subparsers
+    command = args.command
+    if command is None:
+        parser.print_help()
         quit()
     
     # -- ls
@@ -201,3 +238,60 @@ if __name__ == '__main__':
         log(post(url, {'request': 'ls'}))
     elif command == 'set':
         log('Successfully set server information.')
+    elif command == 'halt':
+        log(post(url, {'request': 'halt'}))
+    elif command == 'remove':
+        request = {'request': 'remove'}
+        if args.name:
+            request['name'] = args.name
+        elif args.id:
+            request['id'] = args.id
+        log(post(url, request))
+    elif command == 'stats':
+        request = {'request': 'stats'}
+        if args.name:
+            request['name'] = args.name
+        elif args.id:
+            request['id'] = args.id
+        log(post(url, request))
+    elif command == 'logs' and args.follow:
+        follow(url, args.name or args.id)
+    elif command == 'logs':
+        request = {'request': 'logs', 'lines': args.lines or 100}
+        if args.name:
+            request['name'] = args.name
+        elif args.id:
+            request['id'] = args.id
+        if args.run:
+            request['run'] = args.run
+        response = post(url, request)
+        if response:
+            for line in response['lines']:
+                print(line)
+    elif command == 'next_runs':
+        request = {'request': 'next_runs', 'count': args.count or 10}
+        if args.name:
+            request['name'] = args.name
+        elif args.id:
+            request['id'] = args.id
+        log(post(url, request))
+    elif command == 'deploy':
+        # the command is suggested by the server from the file extension
+        request = {'request': 'deploy', 'name': args.name or args.id or 'Job', 'target_path': args.target_path, 'command': ''}
+        # comma separated options are sent as lists
+        if args.weekdays:
+            request['operating_week_days'] = [d.strip() for d in args.weekdays.split(',')]
+        if args.daytime:
+            request['operating_time_window'] = [t.strip() for t in args.daytime.split(',')]
+        if args.tags:
+            request['tags'] = [t.strip() for t in args.tags.split(',') if t.strip()]
+        if args.cpu_affinity:
+            try:
+                request['cpu_affinity'] = [int(cpu) for cpu in args.cpu_affinity.split(',')]
+            except ValueError:
+                log('cpu_affinity must be a list of cpu numbers e.g. 0,1', 'red')
+                quit()
+        for arg in ('repeat', 'schedule', 'priority', 'timeout', 'max_memory', 'cpu_quota', 'nice'):
+            if args.__dict__[arg] is not None:
+                request[arg] = args.__dict__[arg]
+        log(post(url, request))
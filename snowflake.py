@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 from backend.handlers import APIHandler
+from backend.server import PooledHTTPServer
 import socketserver
 import json
 
@@ -9,6 +10,20 @@ import json
 Main orchestration of handlers for snowflake server.
 '''
 
+def createServer (conf):
+
+    '''
+    Creates the API endpoint according to the server_mode in config.json:
+        - pooled: concurrent, bounded pool of server_workers threads (default)
+        - single: one request at a time
+    '''
+
+    address = (conf["host"], conf["port"])
+    if conf.get("server_mode", "pooled") == "single":
+        return socketserver.TCPServer(address, APIHandler)
+    return PooledHTTPServer(address, APIHandler, conf.get("server_workers", 32),
+                            stream_limit=conf.get("stream_limit", 256))
+
 if __name__ == '__main__':
 
     with open('config.json') as f:
@@ -17,10 +32,10 @@ if __name__ == '__main__':
         conf = json.load(f)
 
         # define endpoint
-        with socketserver.TCPServer((conf["host"], conf["port"]), APIHandler) as __web_api__:
+        with createServer(conf) as __web_api__:
 
             try:
                 __web_api__.serve_forever()
             except KeyboardInterrupt:
                 print('\nquit.')
-                exit()
\ No newline at end of file
+                exit()